@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import stat
+import time
+import base64
+import socket
+import struct
+import hashlib
+import tempfile
+import subprocess
+from pathlib import Path
+
+from .clipboard import ClipboardManager, SALT_SIZE
+
+# --- AGENT CONFIGURATION ---
+DEFAULT_TTL = 900
+DEFAULT_IDLE = 300
+CLIENT_TIMEOUT = 0.5
+MAX_REQUEST = 4096
+
+
+def is_supported():
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+
+
+def socket_path():
+    """
+    Per-user socket inside a 0700 directory.
+    Override with VAULT_AGENT_SOCK (its directory must be private too).
+    """
+    override = os.environ.get("VAULT_AGENT_SOCK")
+    if override:
+        return Path(override)
+    runtime = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(runtime) / f"pwm-agent-{os.getuid()}" / "agent.sock"
+
+
+def vault_id(salt: bytes) -> str:
+    """Identifies a vault by its salt, so a new salt never reuses an old key."""
+    return hashlib.sha256(salt).hexdigest()[:32]
+
+
+# --- TRUST ---
+# Keys only go to a socket in a directory that nobody else could have created
+# or written to: a real directory (not a symlink) owned by us with mode 0700.
+# The default path sits in a shared /tmp when XDG_RUNTIME_DIR is unset.
+def is_private_dir(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == 0o700
+
+
+def peer_uid(sock):
+    """UID of the process at the other end of a Unix socket, or None where the OS can't tell."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _pid, uid, _gid = struct.unpack("3i", creds)
+    return uid
+
+
+# --- CLIENT ---
+def request(payload):
+    """
+    Sends one request to the agent. Returns the reply dict, or None if there is
+    no agent, or none we can trust (see is_private_dir, peer_uid).
+    """
+    if not is_supported():
+        return None
+    path = socket_path()
+    if not is_private_dir(path.parent):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(str(path))
+            if peer_uid(sock) not in (None, os.getuid()):
+                return None
+            sock.sendall(json.dumps(payload).encode('utf-8') + b"\n")
+            reply = sock.makefile('rb').readline()
+        return json.loads(reply) if reply else None
+    except (OSError, ValueError):
+        return None
+
+
+def is_running():
+    return bool((request({"op": "status"}) or {}).get("ok"))
+
+
+def fetch_key(vid):
+    reply = request({"op": "get", "vault": vid})
+    if reply and reply.get("ok"):
+        return base64.b64decode(reply["key"])
+    return None
+
+
+def store_key(vid, key, ttl=None):
+    """Caches a key in the agent. Nothing is sent unless a trusted agent answers `status` first."""
+    if not is_running():
+        return False
+    payload = {"op": "put", "vault": vid, "key": base64.b64encode(key).decode('utf-8')}
+    if ttl:
+        payload["ttl"] = ttl
+    reply = request(payload)
+    return bool(reply and reply.get("ok"))
+
+
+def forget_key(vid):
+    request({"op": "forget", "vault": vid})
+
+
+def clear_clipboard_later(value_digest, seconds):
+    """Hands a pending clipboard clear to the agent. Only the value's salted digest is sent."""
+    salt, hashed = value_digest[:SALT_SIZE], value_digest[SALT_SIZE:]
+    reply = request({"op": "clip", "salt": salt.hex(), "digest": hashed.hex(), "after": seconds})
+    return bool(reply and reply.get("ok"))
+
+
+# --- SERVER ---
+class KeyAgent:
+    """
+    Holds derived vault keys in memory behind a permission-restricted Unix socket.
+    Keys expire after `ttl` seconds, or after `idle` seconds without use.
+    Also clears the clipboard for scripting commands that exit right after copying.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, idle=DEFAULT_IDLE):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.idle = idle
+        self.keys = {}  # vault_id -> [bytearray key, expires_at, last_used]
+        self.clipboard = ClipboardManager()
+        self.running = False
+
+    def _bind(self):
+        """
+        Creates the socket directory (0700, like mkdtemp) if missing. An existing
+        one is never chmod-ed: it must already be private to this user.
+        """
+        self.path.parent.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.mkdir(self.path.parent, 0o700)
+        except FileExistsError:
+            pass
+        if not is_private_dir(self.path.parent):
+            sys.exit(f"[!] {self.path.parent} is not a private directory (owned by you, mode 0700). Agent not started.")
+        if self.path.exists():
+            if request({"op": "status"}) is not None:
+                sys.exit("[!] An agent is already running.")
+            self.path.unlink()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(str(self.path))
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.path, 0o600)
+        sock.listen(8)
+        sock.settimeout(1.0)
+        return sock
+
+    @staticmethod
+    def _peer_allowed(conn):
+        """Where the OS tells, also check the caller's UID (the socket mode covers the rest)."""
+        return peer_uid(conn) in (None, os.getuid())
+
+    def _wipe(self, vid):
+        key = self.keys.pop(vid, None)
+        if key:
+            key[0][:] = bytes(len(key[0]))
+
+    def lock(self):
+        for vid in list(self.keys):
+            self._wipe(vid)
+        self.clipboard.clear()
+
+    def _expire(self):
+        now = time.monotonic()
+        for vid, (_key, expires_at, last_used) in list(self.keys.items()):
+            if now >= expires_at or now - last_used >= self.idle:
+                self._wipe(vid)
+
+    def handle(self, req):
+        self._expire()
+        op = req.get("op")
+        vid = req.get("vault")
+        now = time.monotonic()
+
+        match op:
+            case "put":
+                self._wipe(vid)
+                ttl = min(int(req.get("ttl", self.ttl)), self.ttl)
+                key = bytearray(base64.b64decode(req["key"]))
+                self.keys[vid] = [key, now + ttl, now]
+                return {"ok": True}
+            case "get":
+                entry = self.keys.get(vid)
+                if not entry:
+                    return {"ok": False}
+                entry[2] = now
+                return {"ok": True, "key": base64.b64encode(bytes(entry[0])).decode('utf-8')}
+            case "forget":
+                self._wipe(vid)
+                return {"ok": True}
+            case "clip":
+                value_digest = bytes.fromhex(req["salt"]) + bytes.fromhex(req["digest"])
+                self.clipboard.schedule(value_digest, int(req["after"]))
+                return {"ok": True}
+            case "lock":
+                self.lock()
+                return {"ok": True}
+            case "status":
+                return {"ok": True, "vaults": len(self.keys), "ttl": self.ttl, "idle": self.idle}
+            case "stop":
+                self.running = False
+                return {"ok": True}
+            case _:
+                return {"ok": False, "error": "unknown op"}
+
+    def serve(self):
+        sock = self._bind()
+        self.running = True
+        try:
+            while self.running:
+                self._expire()
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    continue
+                with conn:
+                    try:
+                        conn.settimeout(CLIENT_TIMEOUT)
+                        if not self._peer_allowed(conn):
+                            continue
+                        line = conn.makefile('rb').readline(MAX_REQUEST)
+                        reply = self.handle(json.loads(line))
+                        conn.sendall(json.dumps(reply).encode('utf-8') + b"\n")
+                    except (OSError, ValueError, KeyError):
+                        continue
+        finally:
+            self.lock()
+            sock.close()
+            self.path.unlink(missing_ok=True)
+
+
+def start_background(ttl, idle):
+    """Launches `agent serve` as a detached process (like ssh-agent)."""
+    if getattr(sys, 'frozen', False):
+        cmd = [sys.executable]
+    else:
+        cmd = [sys.executable, str(Path(__file__).resolve().parent.parent / "main.py")]
+    cmd += ["agent", "serve", "--ttl", str(ttl), "--idle", str(idle)]
+
+    subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+    for _ in range(50):
+        if is_running():
+            return True
+        time.sleep(0.1)
+    return False
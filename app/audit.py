@@ -0,0 +1,126 @@
+import math
+import struct
+import string
+
+# --- PASSWORD HEALTH ---
+# Each password is reduced once to a fingerprint record. The report is then
+# built from records alone, so repeat audits never decrypt unchanged passwords.
+# RECORD: EXACT (16) | NEAR (16) | LENGTH (u16) | BITS (u16) | CLASSES (u8)
+# EXACT and NEAR are keyed HMACs (audit subkey) of the password and of its
+# skeleton: equal only for equal inputs, meaningless without the vault key.
+RECORD = struct.Struct(">16s16sHHB")
+RECORD_AAD = b"audit-record:"
+NO_SKELETON = bytes(16)
+
+WEAK_BITS = 50
+MIN_LENGTH = 10
+MIN_SKELETON = 4    # shorter skeletons ("abc", "qwe") would group unrelated passwords
+
+CLASSES = (
+    ("lower", string.ascii_lowercase, 26),
+    ("upper", string.ascii_uppercase, 26),
+    ("digit", string.digits, 10),
+    ("symbol", string.punctuation + " ", 33),
+)
+OTHER_POOL = 100    # non-ASCII characters
+LEET = str.maketrans("@4310$57!|", "aaeiosstil")
+SUFFIXES = string.digits + string.punctuation + " "
+PREFIXES = SUFFIXES.translate(str.maketrans("", "", "@$!|"))    # a leading "$" is an "s"
+
+
+def record_aad(entry_id):
+    """Binds a sealed record to its entry ID, so records can't be swapped between rows."""
+    return RECORD_AAD + struct.pack(">Q", entry_id)
+
+
+_CLASS_SETS = tuple(frozenset(chars) for _, chars, _ in CLASSES)
+_ASCII = frozenset(map(chr, range(128)))
+
+
+def _class_mask(password):
+    chars = set(password)
+    mask = 0
+    for bit, members in enumerate(_CLASS_SETS):
+        if not chars.isdisjoint(members):
+            mask |= 1 << bit
+    if not chars <= _ASCII:
+        mask |= 1 << len(CLASSES)
+    return mask
+
+
+def class_names(mask):
+    names = [name for bit, (name, _, _) in enumerate(CLASSES) if mask & (1 << bit)]
+    if mask & (1 << len(CLASSES)):
+        names.append("other")
+    return names
+
+
+def entropy_bits(password, mask=None):
+    """
+    Brute-force estimate: log2(charset pool) per character, where characters
+    that repeat or continue a sequence of the previous one ("aaa", "abc", "321")
+    count as free.
+    """
+    mask = _class_mask(password) if mask is None else mask
+    pool = sum(size for bit, (_, _, size) in enumerate(CLASSES) if mask & (1 << bit))
+    if mask & (1 << len(CLASSES)):
+        pool += OTHER_POOL
+    if not pool:
+        return 0
+    codes = [ord(c) for c in password]
+    effective = min(len(codes), 1) + sum(abs(b - a) > 1 for a, b in zip(codes, codes[1:]))
+    return round(effective * math.log2(pool))
+
+
+def skeleton(password):
+    """
+    What's left once the usual variations are undone: case, leetspeak, and
+    digits/symbols around the word ("Summer2023!" and "summer24" -> "summer").
+    """
+    core = password.lower().lstrip(PREFIXES).rstrip(SUFFIXES).translate(LEET)
+    return core if len(core) >= MIN_SKELETON else ""
+
+
+def fingerprint(password, token):
+    """Record for one password. `token(term)` is the keyed HMAC (see SecurityManager.blind_token)."""
+    mask = _class_mask(password)
+    core = skeleton(password)
+    return RECORD.pack(
+        token(password),
+        token("near:" + core) if core else NO_SKELETON,
+        min(len(password), 0xFFFF),
+        min(entropy_bits(password, mask), 0xFFFF),
+        mask,
+    )
+
+
+def weakness(length, bits):
+    """Reasons a password counts as weak (empty if it doesn't)."""
+    reasons = []
+    if length < MIN_LENGTH:
+        reasons.append(f"shorter than {MIN_LENGTH}")
+    if bits < WEAK_BITS:
+        reasons.append(f"~{bits} bits")
+    return reasons
+
+
+def report(records):
+    """
+    {id: record} -> reused (same password), similar (same skeleton, different
+    passwords) and weak entries. Groups are lists of IDs in ID order.
+    """
+    exact, near, weak = {}, {}, []
+    for entry_id in sorted(records):
+        fp, near_fp, length, bits, mask = RECORD.unpack(records[entry_id])
+        exact.setdefault(fp, []).append(entry_id)
+        if near_fp != NO_SKELETON:
+            near.setdefault(near_fp, {}).setdefault(fp, []).append(entry_id)
+        reasons = weakness(length, bits)
+        if reasons:
+            weak.append({"id": entry_id, "length": length, "bits": bits,
+                         "classes": class_names(mask), "reasons": reasons})
+
+    reused = [ids for ids in exact.values() if len(ids) > 1]
+    similar = [sorted(i for ids in group.values() for i in ids)
+               for group in near.values() if len(group) > 1]
+    return {"reused": reused, "similar": similar, "weak": weak}
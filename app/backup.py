@@ -0,0 +1,173 @@
+import os
+import json
+import struct
+
+from .security import SecurityManager
+
+# --- FILE FORMAT ---
+# MAGIC | VERSION (1) | HEADER_LEN (4) | HEADER (JSON, authenticated as AAD)
+# then segments: LEN (4) | AES-GCM(segment records)
+# Segment nonce = PREFIX (7) | COUNTER (4) | FINAL FLAG (1), so segments can't be
+# reordered, dropped or truncated without failing authentication.
+MAGIC = b"PMBK"
+VERSION = 1
+SEGMENT_SIZE = 1 << 20
+NONCE_PREFIX_SIZE = 7
+FILE_SALT_SIZE = 16
+
+T_NONE, T_INT, T_BYTES, T_STR, T_FLOAT = range(5)
+
+
+class BackupError(Exception):
+    pass
+
+
+def _backup_key(key, file_salt):
+    return SecurityManager.derive_subkey(key, b"backup:" + file_salt)
+
+
+def _nonce(prefix, counter, final):
+    return prefix + struct.pack(">IB", counter, 1 if final else 0)
+
+
+def _encode_value(value):
+    if value is None:
+        return bytes([T_NONE])
+    if isinstance(value, int):
+        return bytes([T_INT]) + struct.pack(">q", value)
+    if isinstance(value, float):
+        return bytes([T_FLOAT]) + struct.pack(">d", value)
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+        return bytes([T_STR]) + struct.pack(">I", len(value)) + value
+    value = bytes(value)
+    return bytes([T_BYTES]) + struct.pack(">I", len(value)) + value
+
+
+def _decode_value(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag == T_NONE:
+        return None, pos
+    if tag == T_INT:
+        return struct.unpack_from(">q", buf, pos)[0], pos + 8
+    if tag == T_FLOAT:
+        return struct.unpack_from(">d", buf, pos)[0], pos + 8
+    (length,) = struct.unpack_from(">I", buf, pos)
+    pos += 4
+    data = bytes(buf[pos:pos + length])
+    if tag == T_STR:
+        return data.decode('utf-8'), pos + length
+    if tag == T_BYTES:
+        return data, pos + length
+    raise BackupError("Corrupt record.")
+
+
+def encode_record(table_no, row):
+    return bytes([table_no]) + b"".join(_encode_value(v) for v in row)
+
+
+def decode_records(buf, widths):
+    """Yields (table_no, row) from one decrypted segment."""
+    pos = 0
+    while pos < len(buf):
+        table_no = buf[pos]
+        pos += 1
+        row = []
+        for _ in range(widths[table_no]):
+            value, pos = _decode_value(buf, pos)
+            row.append(value)
+        yield table_no, tuple(row)
+
+
+class BackupWriter:
+    """
+    Streams records into an encrypted backup file.
+    Only one segment is ever held in memory.
+    """
+
+    def __init__(self, f, key, config, tables):
+        """`tables` is a list of [name, columns]; write() refers to them by position."""
+        self.f = f
+        file_salt = os.urandom(FILE_SALT_SIZE)
+        self.prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self.key = _backup_key(key, file_salt)
+        self.counter = 0
+        self.buffer = bytearray()
+        self.records = 0
+
+        header = {
+            "file_salt": SecurityManager.encode_b64(file_salt),
+            "nonce_prefix": SecurityManager.encode_b64(self.prefix),
+            "config": config,
+            "tables": tables,
+        }
+        self.aad = json.dumps(header, sort_keys=True).encode('utf-8')
+        f.write(MAGIC + bytes([VERSION]) + struct.pack(">I", len(self.aad)) + self.aad)
+
+    def _flush(self, final):
+        nonce = _nonce(self.prefix, self.counter, final)
+        sealed = SecurityManager.seal(self.key, nonce, bytes(self.buffer), self.aad)
+        self.f.write(struct.pack(">I", len(sealed)) + sealed)
+        self.counter += 1
+        self.buffer.clear()
+
+    def write(self, table_no, row):
+        self.buffer += encode_record(table_no, row)
+        self.records += 1
+        if len(self.buffer) >= SEGMENT_SIZE:
+            self._flush(final=False)
+
+    def close(self):
+        self._flush(final=True)
+
+
+def read_header(f):
+    """Reads the plaintext (but authenticated) header. No key needed."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise BackupError("Not a vault backup file.")
+    version = f.read(1)
+    if not version or version[0] != VERSION:
+        raise BackupError("Unsupported backup version.")
+    (length,) = struct.unpack(">I", f.read(4))
+    aad = f.read(length)
+    return json.loads(aad), aad
+
+
+def read_records(f, key, header, aad):
+    """
+    Yields (table_name, columns, row) from the segments after the header.
+    Raises BackupError on tampering or truncation.
+    """
+    backup_key = _backup_key(key, SecurityManager.decode_b64(header["file_salt"]))
+    prefix = SecurityManager.decode_b64(header["nonce_prefix"])
+    tables = header["tables"]
+    widths = [len(columns) for _name, columns in tables]
+
+    counter = 0
+    while True:
+        raw_len = f.read(4)
+        if len(raw_len) < 4:
+            raise BackupError("Backup is truncated.")
+        (length,) = struct.unpack(">I", raw_len)
+        sealed = f.read(length)
+
+        try:
+            plain = SecurityManager.unseal(backup_key, _nonce(prefix, counter, True), sealed, aad)
+            final = True
+        except Exception:
+            try:
+                plain = SecurityManager.unseal(backup_key, _nonce(prefix, counter, False), sealed, aad)
+                final = False
+            except Exception:
+                raise BackupError("Backup is corrupt or the key is wrong.") from None
+
+        for table_no, row in decode_records(plain, widths):
+            name, columns = tables[table_no]
+            yield name, columns, row
+
+        counter += 1
+        if final:
+            if f.read(1):
+                raise BackupError("Unexpected data after the final segment.")
+            return
@@ -0,0 +1,168 @@
+import os
+import mmap
+import heapq
+import struct
+import hashlib
+import tempfile
+from pathlib import Path
+
+# --- CORPUS FORMAT ---
+# Offline copy of a breached-password list (e.g. HIBP "SHA-1 ordered by hash").
+# MAGIC (8) | RECORDS (u64) | TABLE: 65537 x u64 | RECORDS x [SHA-1 (20) | COUNT (u32)]
+# Records are sorted by hash. TABLE[p] is the index of the first record whose
+# hash starts with the 16-bit prefix p, so a lookup touches one table page and
+# binary-searches a single bucket (~13k records for the full HIBP list).
+MAGIC = b"PWMHIBP1"
+DIGEST_SIZE = 20
+RECORD = struct.Struct(">20sI")
+PREFIXES = 1 << 16
+TABLE_OFFSET = len(MAGIC) + 8
+DATA_OFFSET = TABLE_OFFSET + (PREFIXES + 1) * 8
+MAX_COUNT = 0xFFFFFFFF
+CHUNK_RECORDS = 2_000_000     # records sorted in memory per run while building
+
+CORPUS_FILE = "breach.bin"
+
+
+class CorpusError(ValueError):
+    pass
+
+
+def default_path():
+    from .storage import DATA_DIR
+    return DATA_DIR / CORPUS_FILE
+
+
+def sha1(password: bytes) -> bytes:
+    return hashlib.sha1(password).digest()
+
+
+# --- BUILD ---
+def _parse(lines):
+    """'HASH[:COUNT]' lines -> (digest, count). Malformed lines are skipped."""
+    for line in lines:
+        hex_digest, _, count = line.strip().partition(b":")
+        if len(hex_digest) != DIGEST_SIZE * 2:
+            continue
+        try:
+            yield bytes.fromhex(hex_digest.decode('ascii')), int(count or 1)
+        except ValueError:
+            continue
+
+
+def _write_run(records, tmp_dir):
+    records.sort()
+    f = tempfile.TemporaryFile(dir=tmp_dir)
+    for digest, count in records:
+        f.write(RECORD.pack(digest, min(count, MAX_COUNT)))
+    f.seek(0)
+    return f
+
+
+def _read_run(f):
+    while chunk := f.read(RECORD.size * 4096):
+        yield from RECORD.iter_unpack(chunk)
+
+
+def build(source, out=None, chunk_records=CHUNK_RECORDS):
+    """
+    Converts a text hash list into the corpus format, once. Unsorted input is
+    handled with an external merge sort (runs of `chunk_records`), so memory
+    stays bounded whatever the list size. Duplicate hashes are merged.
+    Returns the number of records written.
+    """
+    out = Path(out or default_path())
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    runs = []
+    try:
+        with open(source, 'rb') as src:
+            records = []
+            for record in _parse(src):
+                records.append(record)
+                if len(records) >= chunk_records:
+                    runs.append(_write_run(records, out.parent))
+                    records = []
+            if records or not runs:
+                runs.append(_write_run(records, out.parent))
+
+        table = [0] * (PREFIXES + 1)
+        written = 0
+        with open(tmp, 'wb') as f:
+            f.write(b"\0" * DATA_OFFSET)
+            last, pending = None, 0
+            for digest, count in heapq.merge(*(_read_run(r) for r in runs)):
+                if digest == last:
+                    pending = min(pending + count, MAX_COUNT)
+                    continue
+                if last is not None:
+                    f.write(RECORD.pack(last, pending))
+                    table[int.from_bytes(last[:2], 'big') + 1] += 1
+                    written += 1
+                last, pending = digest, count
+            if last is not None:
+                f.write(RECORD.pack(last, pending))
+                table[int.from_bytes(last[:2], 'big') + 1] += 1
+                written += 1
+
+            for p in range(PREFIXES):
+                table[p + 1] += table[p]
+            f.seek(0)
+            f.write(MAGIC + struct.pack(">Q", written) + struct.pack(f">{PREFIXES + 1}Q", *table))
+        os.replace(tmp, out)
+    finally:
+        for run in runs:
+            run.close()
+        tmp.unlink(missing_ok=True)
+    return written
+
+
+# --- LOOKUP ---
+class BreachCorpus:
+    """
+    Read-only view of a corpus through mmap. Nothing is loaded up front:
+    each lookup faults in one table page and a few record pages.
+    """
+
+    def __init__(self, path=None):
+        path = Path(path or default_path())
+        if not path.exists():
+            raise CorpusError(f"No breach corpus at {path}. Build one with `corpus <hash list>`.")
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise CorpusError("Breach corpus is empty.")
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise CorpusError("Not a breach corpus file.")
+        if hasattr(self._mm, "madvise") and hasattr(mmap, "MADV_RANDOM"):
+            self._mm.madvise(mmap.MADV_RANDOM)    # no read-ahead: lookups are scattered
+        self.records = struct.unpack_from(">Q", self._mm, len(MAGIC))[0]
+
+    def count(self, digest):
+        """Times a SHA-1 digest was seen in breaches (0 if never)."""
+        mm = self._mm
+        lo, hi = struct.unpack_from(">QQ", mm, TABLE_OFFSET + int.from_bytes(digest[:2], 'big') * 8)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = DATA_OFFSET + mid * RECORD.size
+            probe = mm[offset:offset + DIGEST_SIZE]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return RECORD.unpack_from(mm, offset)[1]
+        return 0
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,144 @@
+import time
+from bisect import bisect_left, insort
+
+from .search import TrigramIndex
+
+# --- CACHE CONFIGURATION ---
+MAX_ENTRIES = 100_000
+TTL_SECONDS = 900
+
+
+# Orderings kept for the session (see SortedIndex).
+ORDERINGS = {
+    'id': lambda e: e['id'],
+    'site': lambda e: (e['site'].lower(), e['id']),
+    'username': lambda e: (e['username'].lower(), e['id']),
+}
+
+
+class SortedIndex:
+    """
+    Entry IDs kept sorted by one key. Writes use bisect, so a sorted page
+    costs O(page) instead of a full O(n log n) sort.
+    """
+
+    def __init__(self, key_fn):
+        self.key_fn = key_fn
+        self._sorted = []   # [(key, id)]
+        self._keys = {}     # id -> key
+
+    def build(self, entries):
+        self._keys = {e['id']: self.key_fn(e) for e in entries}
+        self._sorted = sorted((k, i) for i, k in self._keys.items())
+
+    def put(self, entry):
+        self.remove(entry['id'])
+        key = self.key_fn(entry)
+        self._keys[entry['id']] = key
+        insort(self._sorted, (key, entry['id']))
+
+    def remove(self, entry_id):
+        key = self._keys.pop(entry_id, None)
+        if key is not None:
+            del self._sorted[bisect_left(self._sorted, (key, entry_id))]
+
+    def ids(self, offset, limit):
+        return [i for _, i in self._sorted[offset:offset + limit]]
+
+    def clear(self):
+        self._sorted = []
+        self._keys = {}
+
+
+class EntryCache:
+    """
+    Session-scoped store of decrypted entries, keyed by row ID.
+    Only used when it holds the whole vault; otherwise callers fall back to the DB.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = {}
+        self._loaded_at = None
+        self._orders = {name: SortedIndex(fn) for name, fn in ORDERINGS.items()}
+        self._live = None   # TrigramIndex, built on first live search
+
+    def is_fresh(self):
+        """True if the cache holds the full vault and has not expired."""
+        if self._loaded_at is None:
+            return False
+        if time.monotonic() - self._loaded_at > self.ttl:
+            self.clear()
+            return False
+        return True
+
+    def fill(self, entries):
+        """Replaces the contents with a full vault snapshot (if it fits)."""
+        self.clear()
+        if len(entries) > self.max_entries:
+            return
+        self._entries = {e['id']: e for e in entries}
+        for order in self._orders.values():
+            order.build(entries)
+        self._loaded_at = time.monotonic()
+
+    def entries(self):
+        """Returns copies, so callers can scrub fields without touching the cache."""
+        return [dict(e) for e in self._entries.values()]
+
+    def get(self, entry_id):
+        entry = self._entries.get(entry_id)
+        return dict(entry) if entry else None
+
+    def page(self, order, offset, limit):
+        """One page of entries in 'id', 'site' or 'username' order."""
+        return [dict(self._entries[i]) for i in self._orders[order].ids(offset, limit)]
+
+    def build_search_index(self):
+        """Builds the live-search index once per fill; writes keep it current after that."""
+        if self._live is None:
+            self._live = TrigramIndex()
+            self._live.build(self._entries.values())
+
+    def search(self, query, limit):
+        """Ranked live-search hits: ([entries], more)."""
+        self.build_search_index()
+        ids, more = self._live.query(query, limit)
+        return [dict(self._entries[i]) for i in ids], more
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, entry):
+        """Write-through for add/edit. Drops the cache if it would overflow."""
+        if not self.is_fresh():
+            return
+        if entry['id'] not in self._entries and len(self._entries) >= self.max_entries:
+            self.clear()
+            return
+        self._entries[entry['id']] = dict(entry)
+        for order in self._orders.values():
+            order.put(entry)
+        if self._live is not None:
+            self._live.add(entry)
+
+    def remove(self, entry_id):
+        if self.is_fresh():
+            self._entries.pop(entry_id, None)
+            for order in self._orders.values():
+                order.remove(entry_id)
+            if self._live is not None:
+                self._live.remove(entry_id)
+
+    def is_empty(self):
+        return not self._entries
+
+    def clear(self):
+        for entry in self._entries.values():
+            entry.clear()
+        self._entries = {}
+        self._loaded_at = None
+        for order in self._orders.values():
+            order.clear()
+        self._live = None
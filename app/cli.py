@@ -0,0 +1,309 @@
+import csv
+import sys
+import json
+import time
+import argparse
+
+from . import agent
+from . import metrics
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="vault",
+        description="CLI password manager. Run without a command for the interactive menu."
+    )
+    parser.add_argument("--metrics", action="store_true",
+                        help="Print per-phase timings after each operation and log them to data/metrics.jsonl "
+                             "(or set VAULT_METRICS=1)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Write a cProfile dump of the session to FILE (or set VAULT_PROFILE)")
+    sub = parser.add_subparsers(dest="command")
+
+    # --- AGENT ---
+    agent_cmd = sub.add_parser("agent", help="Key-caching agent (skips Argon2id on repeat unlocks)")
+    agent_sub = agent_cmd.add_subparsers(dest="agent_command", required=True)
+    for name, help_text in (("start", "Start the agent in the background"),
+                            ("serve", "Run the agent in the foreground")):
+        p = agent_sub.add_parser(name, help=help_text)
+        p.add_argument("--ttl", type=int, default=agent.DEFAULT_TTL, help="Max seconds a key is kept")
+        p.add_argument("--idle", type=int, default=agent.DEFAULT_IDLE, help="Forget keys unused for this long")
+    agent_sub.add_parser("lock", help="Forget all cached keys")
+    agent_sub.add_parser("stop", help="Stop the agent")
+    agent_sub.add_parser("status", help="Show agent status")
+
+    # --- SCRIPTING ---
+    get_cmd = sub.add_parser("get", help="Print the password of one entry")
+    get_cmd.add_argument("ref", help="Entry ID or exact site name")
+    get_cmd.add_argument("--json", action="store_true", help="Print the full entry as JSON")
+
+    copy_cmd = sub.add_parser("copy", help="Copy the password of one entry to the clipboard")
+    copy_cmd.add_argument("ref", help="Entry ID or exact site name")
+    copy_cmd.add_argument("--clear-after", type=int, metavar="SECONDS",
+                          help="Clear the clipboard after this long (default: VAULT_CLIPBOARD_SECONDS or 60)")
+
+    list_cmd = sub.add_parser("list", help="List entries (passwords are never printed)")
+    list_cmd.add_argument("--json", action="store_true", help="JSON output")
+
+    search_cmd = sub.add_parser("search", help="Search site/username")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--json", action="store_true", help="JSON output")
+
+    add_cmd = sub.add_parser("add", help="Add an entry")
+    add_cmd.add_argument("--site", required=True)
+    add_cmd.add_argument("--username", default="")
+    pwd_source = add_cmd.add_mutually_exclusive_group()
+    pwd_source.add_argument("--generate", action="store_true", help="Generate a random password")
+    pwd_source.add_argument("--password-stdin", action="store_true", help="Read the password from stdin")
+    add_cmd.add_argument("--length", type=int, default=24, help="Generated password length")
+    add_cmd.add_argument("--json", action="store_true", help="JSON output")
+
+    import_cmd = sub.add_parser("import", help="Bulk import a CSV / JSON Lines export")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--format", choices=("csv", "jsonl"), help="Default: from the file extension")
+    import_cmd.add_argument("--batch", type=int, help="Rows per transaction (default: 1000)")
+    import_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    export_cmd = sub.add_parser("export", help="Write an encrypted, streaming backup of the whole vault")
+    export_cmd.add_argument("file")
+    export_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    restore_cmd = sub.add_parser("restore", help="Restore a backup into an empty vault")
+    restore_cmd.add_argument("file")
+    restore_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    pack_cmd = sub.add_parser("pack", help="Store entry metadata in compressed, encrypted pages")
+    pack_cmd.add_argument("--page-records", type=int, help="Entries per page (default: 64)")
+    pack_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    unpack_cmd = sub.add_parser("unpack", help="Back to one encrypted row per entry")
+    unpack_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    audit_cmd = sub.add_parser("audit", help="Find reused, similar, weak and breached passwords")
+    audit_cmd.add_argument("--corpus", help="Breach corpus (default: data/breach.bin, skipped if missing)")
+    audit_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    corpus_cmd = sub.add_parser("corpus", help="Convert a HIBP-style SHA-1 list (HASH:COUNT lines) for audit")
+    corpus_cmd.add_argument("source", help="Downloaded hash list (text)")
+    corpus_cmd.add_argument("--out", help="Corpus file (default: data/breach.bin)")
+
+    sync_cmd = sub.add_parser("sync", help="Exchange changed entries with another copy of this vault")
+    sync_cmd.add_argument("target", help="Other vault file, or a directory holding vault.db (created if missing)")
+    sync_cmd.add_argument("--json", action="store_true", help="JSON report")
+
+    sub.add_parser("passwd", help="Change the master password (and optionally the Secret Key)")
+
+    retune_cmd = sub.add_parser("retune", help="Re-calibrate Argon2id for this machine")
+    retune_cmd.add_argument("--target", type=float, help="Target unlock time in seconds (default: 1.0)")
+
+    return parser
+
+
+SCRIPT_COMMANDS = ("get", "copy", "list", "search", "add", "import", "export", "restore", "pack", "unpack",
+                   "sync", "audit", "corpus", "passwd", "retune")
+
+MAX_SKIPPED_SHOWN = 20
+
+
+def _public(entry):
+    return {"id": entry['id'], "site": entry['site'], "username": entry['username']}
+
+
+def _print_table(entries):
+    for e in entries:
+        print(f"{e['id']}\t{e['site']}\t{e['username']}")
+
+
+def run_command(args):
+    """
+    Runs one scripting command and returns the exit code.
+    stdout carries only the result; messages go to stderr.
+    """
+    if args.command == "corpus":
+        return run_corpus(args)
+
+    from .controller import VaultController
+    from .views import ScriptView
+
+    app = VaultController(view=ScriptView())
+    try:
+        with metrics.operation(args.command, app.view.show_message):
+            return _dispatch(app, args)
+    finally:
+        app.close()
+
+
+def _dispatch(app, args):
+    from .backup import BackupError
+
+    if args.command != "restore":
+        app.script_login()
+
+    match args.command:
+        case "list" | "search":
+            entries = app.list_entries() if args.command == "list" else app.search(args.query)
+            if args.json:
+                print(json.dumps([_public(e) for e in entries]))
+            else:
+                _print_table(entries)
+            return 0 if entries or args.command == "list" else 1
+
+        case "get":
+            try:
+                entry = app.resolve_entry(args.ref)
+            except LookupError as e:
+                print(f"[!] {e}", file=sys.stderr)
+                return 1
+            print(json.dumps({**_public(entry), "password": entry['password']}) if args.json else entry['password'])
+            return 0
+
+        case "copy":
+            try:
+                app.copy_entry(args.ref, args.clear_after)
+            except LookupError as e:
+                print(f"[!] {e}", file=sys.stderr)
+                return 1
+            return 0
+
+        case "add":
+            pwd = None
+            if args.password_stdin:
+                pwd = sys.stdin.readline().rstrip("\n")
+            elif not args.generate:
+                pwd = app.view.get_password_input()
+            new_id, pwd = app.add_entry(args.site, args.username, pwd, args.length)
+            if args.json:
+                print(json.dumps({"id": new_id, "site": args.site, "username": args.username,
+                                  "password": pwd if args.generate else None}))
+            else:
+                print(new_id)
+                if args.generate:
+                    print(pwd)
+            return 0
+
+        case "import":
+            try:
+                report = app.import_entries(args.file, args.format, args.batch)
+            except (OSError, ValueError, csv.Error) as e:
+                print(f"[!] Import failed: {e}", file=sys.stderr)
+                return 1
+            if args.json:
+                print(json.dumps(report))
+            else:
+                print(f"[+] Imported {report['imported']} entries in {report['seconds']}s "
+                      f"({report['rows_per_second']} rows/s). Skipped: {len(report['skipped'])}.")
+                for line_no, reason in report['skipped'][:MAX_SKIPPED_SHOWN]:
+                    print(f"    line {line_no}: {reason}")
+            return 0
+
+        case "export" | "restore":
+            try:
+                if args.command == "export":
+                    report = app.export_backup(args.file)
+                else:
+                    report = app.restore_backup(args.file)
+            except (OSError, BackupError) as e:
+                print(f"[!] {args.command.capitalize()} failed: {e}", file=sys.stderr)
+                return 1
+            if args.json:
+                print(json.dumps(report))
+            else:
+                done = {"export": "Exported", "restore": "Restored"}[args.command]
+                print(f"[+] {done} {report['records']} records in {report['seconds']}s.")
+            return 0
+
+        case "pack" | "unpack":
+            report = app.pack_vault(args.page_records) if args.command == "pack" else app.unpack_vault()
+            if args.json:
+                print(json.dumps(report))
+            elif args.command == "pack":
+                print(f"[+] Packed {report['packed']} entries into {report['pages']} pages in {report['seconds']}s.")
+            else:
+                print(f"[+] Unpacked {report['unpacked']} entries in {report['seconds']}s.")
+            return 0
+
+        case "audit":
+            from .breach import CorpusError, default_path
+            report = app.audit_vault()
+            if args.corpus or default_path().exists():
+                try:
+                    report['breaches'] = app.audit_breaches(args.corpus)
+                except CorpusError as e:
+                    print(f"[!] {e}", file=sys.stderr)
+                    return 1
+            compromised = report.get('breaches', {}).get('compromised', [])
+            if args.json:
+                print(json.dumps(report))
+            else:
+                for kind in ("reused", "similar"):
+                    for ids in report[kind]:
+                        print(f"{kind.upper()}\t{','.join(map(str, ids))}")
+                for e in report['weak']:
+                    print(f"WEAK\t{e['id']}\t{e['site']}\t{e['username']}\t{'; '.join(e['reasons'])}")
+                for e in compromised:
+                    print(f"BREACHED\t{e['id']}\t{e['site']}\t{e['username']}\t{e['seen']}")
+                print(f"[i] {report['checked']} passwords: {len(report['reused'])} reused groups, "
+                      f"{len(report['similar'])} similar groups, {len(report['weak'])} weak, "
+                      f"{len(compromised)} breached ({report['processed']} re-fingerprinted, "
+                      f"{report['seconds']}s).", file=sys.stderr)
+            return 1 if report['reused'] or report['similar'] or report['weak'] or compromised else 0
+
+        case "sync":
+            try:
+                report = app.sync_vault(args.target)
+            except (OSError, ValueError) as e:
+                print(f"[!] Sync failed: {e}", file=sys.stderr)
+                return 1
+            if args.json:
+                print(json.dumps(report))
+            else:
+                print(f"[+] Synced with {args.target}: pulled {report['pulled']}, pushed {report['pushed']} "
+                      f"({report['conflicts']} conflicts resolved, {report['examined']} changed entries) "
+                      f"in {report['seconds']}s.")
+            return 0
+
+        case "passwd":
+            app.change_master_password_flow()
+            return 0
+
+        case "retune":
+            return 0 if app.retune_kdf_flow(args.target) else 1
+
+
+def run_corpus(args):
+    """Builds the breach corpus. Needs no vault access."""
+    from .breach import build
+
+    started = time.perf_counter()
+    try:
+        records = build(args.source, args.out)
+    except OSError as e:
+        print(f"[!] Corpus build failed: {e}", file=sys.stderr)
+        return 1
+    print(f"[+] Wrote {records} hashes in {round(time.perf_counter() - started, 1)}s.")
+    return 0
+
+
+def run_agent(args):
+    if not agent.is_supported():
+        sys.exit("[!] The agent needs Unix domain sockets (not available on this platform).")
+
+    match args.agent_command:
+        case "start":
+            if agent.request({"op": "status"}):
+                print("[i] Agent already running.")
+            elif agent.start_background(args.ttl, args.idle):
+                print(f"[+] Agent started ({agent.socket_path()}).")
+            else:
+                sys.exit("[!] Agent failed to start.")
+        case "serve":
+            agent.KeyAgent(agent.socket_path(), args.ttl, args.idle).serve()
+        case "lock" | "stop":
+            if agent.request({"op": args.agent_command}) is None:
+                sys.exit("[!] No agent running.")
+            print("[+] Agent locked." if args.agent_command == "lock" else "[+] Agent stopped.")
+        case "status":
+            status = agent.request({"op": "status"})
+            if status is None:
+                sys.exit("[!] No agent running.")
+            print(f"[i] Agent running: {status['vaults']} key(s) cached, ttl={status['ttl']}s, idle={status['idle']}s.")
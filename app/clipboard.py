@@ -0,0 +1,127 @@
+import os
+import sys
+import hmac
+import hashlib
+import threading
+import time
+
+# --- CLIPBOARD CONFIGURATION ---
+CLEAR_SECONDS = 60
+TIMEOUT_ENV = "VAULT_CLIPBOARD_SECONDS"
+
+
+def clear_seconds():
+    """Seconds before a copied password is cleared (VAULT_CLIPBOARD_SECONDS overrides)."""
+    try:
+        return max(int(os.environ.get(TIMEOUT_ENV, CLEAR_SECONDS)), 1)
+    except ValueError:
+        return CLEAR_SECONDS
+
+
+SALT_SIZE = 16
+
+
+def digest(value, salt=None):
+    """
+    What the manager remembers of a copied value, never the value itself:
+    SALT | SHA-256(SALT + value). A fresh random salt per copy, so the digest
+    (which may be handed to the agent) can't be matched against a precomputed
+    table of password hashes.
+    """
+    salt = os.urandom(SALT_SIZE) if salt is None else salt
+    return salt + hashlib.sha256(salt + value.encode('utf-8')).digest()
+
+
+def matches(value, value_digest):
+    return hmac.compare_digest(digest(value, value_digest[:SALT_SIZE]), value_digest)
+
+
+def _system_backend():
+    """(copy, paste) of the platform clipboard, resolved once instead of on every call."""
+    try:
+        import pyperclip
+    except ImportError:
+        sys.exit("[!] Error: 'pyperclip' is missing. Run 'uv add pyperclip'")
+    return pyperclip.determine_clipboard()
+
+
+class ClipboardManager:
+    """
+    Owns the clipboard for one process: a single timer thread and at most one
+    pending clear. Copying again replaces the pending clear. A clear only wipes
+    the clipboard if it still holds what was copied (compared by digest), and
+    skips the backend entirely once a newer copy has superseded it.
+    """
+
+    def __init__(self, timeout=None, backend=None):
+        self.timeout = timeout or clear_seconds()
+        self._backend = backend
+        self._cond = threading.Condition()
+        self._pending = None    # (deadline, digest)
+        self._thread = None
+
+    def _functions(self):
+        if self._backend is None:
+            self._backend = _system_backend()
+        return self._backend
+
+    def copy(self, value, timeout=None):
+        """Copies value and (re)schedules the clear. Returns the timeout in seconds."""
+        copy_fn, _ = self._functions()
+        copy_fn(value)
+        return self.schedule(digest(value), timeout)
+
+    def schedule(self, value_digest, timeout=None):
+        """Clears the clipboard in `timeout` seconds if it still holds the value."""
+        timeout = timeout or self.timeout
+        with self._cond:
+            self._pending = (time.monotonic() + timeout, value_digest)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return timeout
+
+    def pending(self):
+        with self._cond:
+            return self._pending is not None
+
+    def wait(self):
+        """Blocks until the pending clear has run (foreground scripting mode)."""
+        with self._cond:
+            while self._pending is not None:
+                self._cond.wait()
+
+    def clear(self):
+        """Runs the pending clear now (exit, lock, Ctrl+C)."""
+        with self._cond:
+            pending, self._pending = self._pending, None
+            self._cond.notify_all()
+        if pending:
+            self._clear_if(pending[1])
+
+    def cancel(self):
+        """Drops the pending clear (another process took it over)."""
+        with self._cond:
+            self._pending = None
+            self._cond.notify_all()
+
+    def _clear_if(self, value_digest):
+        copy_fn, paste_fn = self._functions()
+        try:
+            if matches(paste_fn(), value_digest):
+                copy_fn("")
+        except Exception:
+            pass    # clipboard unavailable (e.g. no display): nothing to clear
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None or self._pending[0] > time.monotonic():
+                    timeout = self._pending[0] - time.monotonic() if self._pending else None
+                    self._cond.wait(timeout)
+                _, value_digest = self._pending
+                self._pending = None
+            self._clear_if(value_digest)
+            with self._cond:
+                self._cond.notify_all()
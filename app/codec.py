@@ -0,0 +1,102 @@
+import json
+
+from . import metrics
+
+# --- RECORD FORMAT ---
+# VERSION (1) | per field: LEN (varint) | UTF-8 bytes
+# Fields are positional (see META_FIELDS). Readers ignore trailing fields they
+# don't know, so later versions can append fields. Payloads written before this
+# format are JSON objects and are recognised by their first byte, '{'.
+VERSION = 1
+META_FIELDS = ("site", "username")
+_JSON_START = b"{"
+
+
+class CodecError(ValueError):
+    pass
+
+
+def put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def get_varint(buf, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise CodecError("Truncated record.")
+        byte = buf[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _check_version(buf):
+    if not buf or buf[0] != VERSION:
+        raise CodecError("Unsupported record version.")
+
+
+def encode_fields(values):
+    out = bytearray([VERSION])
+    for value in values:
+        data = value.encode('utf-8')
+        put_varint(out, len(data))
+        out += data
+    return bytes(out)
+
+
+def decode_fields(buf):
+    """All fields of a record, as a list of str."""
+    _check_version(buf)
+    fields = []
+    pos = 1
+    size = len(buf)
+    while pos < size:
+        length = buf[pos]
+        if length < 0x80:
+            pos += 1    # fast path: one-byte length
+        else:
+            length, pos = get_varint(buf, pos)
+        end = pos + length
+        if end > size:
+            raise CodecError("Truncated record.")
+        fields.append(buf[pos:end].decode('utf-8'))
+        pos = end
+    return fields
+
+
+def read_field(buf, index):
+    """Decodes one field only: the ones before it are skipped by length, not decoded."""
+    _check_version(buf)
+    pos = 1
+    for _ in range(index + 1):
+        length, pos = get_varint(buf, pos)
+        pos += length
+    if pos > len(buf):
+        raise CodecError("Truncated record.")
+    return buf[pos - length:pos].decode('utf-8')
+
+
+# --- ENTRY METADATA ---
+def encode_meta(site, username):
+    return encode_fields((site, username))
+
+
+@metrics.timed("decode")
+def decode_meta(buf):
+    """Metadata record -> dict. Falls back to JSON for rows written before this format."""
+    if buf[:1] == _JSON_START:
+        return json.loads(buf.decode('utf-8'))
+    return dict(zip(META_FIELDS, decode_fields(buf)))
+
+
+def meta_field(buf, name):
+    """One metadata field (e.g. only 'site' when filtering), without decoding the rest."""
+    if buf[:1] == _JSON_START:
+        return json.loads(buf.decode('utf-8'))[name]
+    return read_field(buf, META_FIELDS.index(name))
@@ -1,36 +1,57 @@
+import os
 import sys
 import secrets
 import string
 import json
-import threading
 import time
 import getpass
+import hashlib
+from pathlib import Path
 
 try:
-    import pyperclip
-except ImportError:
-    print("[!] Error: 'pyperclip' is missing. Run 'uv add pyperclip'")
-    sys.exit(1)
-
-try:
-    from .security import SecurityManager
+    from .security import SecurityManager, KDF_TARGET_SECONDS, NONCE_SIZE
     from .storage import StorageManager
     from .views import VaultView
+    from .cache import EntryCache, ORDERINGS
+    from . import search
+    from . import codec
+    from . import pages
+    from . import metrics
+    from . import agent
+    from . import clipboard
+    from . import importer
+    from . import backup
+    from . import breach
+    from . import audit
+    from .storage import BACKUP_TABLES, ConflictError
 except ImportError as e:
     print(f"[!] Error: {e}")
     sys.exit(1)
 
+SEARCH_INDEX_VERSION = "1"
+IMPORT_BATCH_SIZE = 1000
+RESTORE_BATCH_SIZE = 1000
+MIGRATE_BATCH_SIZE = 1000
+
 
 class VaultController:
-    def __init__(self):
-        self.view = VaultView()
+    def __init__(self, view=None, db=None):
+        self.view = view or VaultView()
         try:
-            self.db = StorageManager()
+            self.db = db or StorageManager()
         except Exception as e:
             sys.exit(f"[!] DB Error: {e}")
         self.key = None
+        self.index_key = None
+        self.cache = EntryCache()
+        self.clipboard = clipboard.ClipboardManager()
+        self._visible = {}
 
     # --- LOGIC HELPERS ---
+    def _op(self, name):
+        """Per-phase timing of one operation (only when metrics are enabled)."""
+        return metrics.operation(name, self.view.show_message)
+
     def _generate_password(self, length=24):
         chars = string.ascii_letters + string.digits + string.punctuation
         return ''.join(secrets.choice(chars) for _ in range(length))
@@ -39,103 +60,416 @@ class VaultController:
         """
         Checks if DB has data. If empty, shows message and returns True.
         """
-        if not self.db.get_all_blobs():
+        empty = self.cache.is_empty() if self.cache.is_fresh() else not self.db.has_secrets()
+        if empty:
             self.view.show_message("[i] Vault is empty.")
             self.view.pause()
             return True
         return False
 
-    def _clipboard_task(self, data):
-        """Background task to clear clipboard."""
-        time.sleep(60)
-        if pyperclip.paste() == data:
-            pyperclip.copy("")
+    def _copy_password(self, target):
+        seconds = self.clipboard.copy(target['password'])
+        self.view.show_message(f"[+] Password for {target['site']} copied! (clears in {seconds}s)")
 
-    def _decrypt_all_entries(self):
-        """Logic to get raw blobs and turn them into readable dicts."""
-        raw_rows = self.db.get_all_blobs()
+        del target['password']
+        self.view.pause()
+
+    def _decrypt_rows(self, raw_rows):
+        """Batch-decrypts (id, blob) rows. Unreadable rows are reported, not hidden."""
         decrypted = []
-        for row_id, blob in raw_rows:
+        failed = []
+        for row_id, plain, error in SecurityManager.decrypt_many(raw_rows, self.key):
             try:
-                json_bytes = SecurityManager.decrypt(blob, self.key)
-                data = json.loads(json_bytes.decode('utf-8'))
+                if error:
+                    raise error
+                data = codec.decode_meta(plain)
                 data['id'] = row_id
                 decrypted.append(data)
             except Exception:
-                continue
+                failed.append(str(row_id))
+
+        if failed:
+            self.view.show_message(f"[!] {len(failed)} entries could not be decrypted (IDs: {', '.join(failed)}).")
         return decrypted
 
-    # --- FLOWS ---
-    def login_flow(self):
-        b64_salt = self.db.get_config("salt")
+    def _decrypt_all_entries(self):
+        """Logic to get raw blobs and turn them into readable dicts."""
+        if self.cache.is_fresh():
+            return self.cache.entries()
+
+        decrypted = self._decrypt_rows(self.db.iter_blobs())
+        decrypted += self._iter_packed_entries()
+        self.cache.fill(decrypted)
+        return self.cache.entries() if self.cache.is_fresh() else decrypted
+
+    def _entries_for_rows(self, rows):
+        """Decrypts a handful of rows, preferring already-decrypted cached copies."""
+        if self.cache.is_fresh():
+            return [e for e in (self.cache.get(row_id) for row_id, _ in rows) if e]
+        return self._decrypt_rows(rows)
+
+    def _show(self, entries):
+        """Remembers the entries on screen, so picking one of them needs no lookup."""
+        self._visible = {str(e['id']): e for e in entries}
+        return entries
+
+    def _fetch_page(self, offset, limit):
+        if self.cache.is_fresh():
+            return self._show(self.cache.page('id', offset, limit))
+        if self._is_packed():
+            # Pages aren't in ID order: list from the (page-decrypted) sorted view.
+            return self._sorted_pager('id')(offset, limit)
+        return self._show(self._entries_for_rows(self.db.get_blob_page(offset, limit)))
+
+    def _sorted_pager(self, order):
+        """
+        Page source in site/username order, served from the session's sorted
+        indexes (kept up to date on add/edit/delete), so no re-sort per view.
+        """
+        if not self.cache.is_fresh():
+            entries = self._decrypt_all_entries()
+            if not self.cache.is_fresh():
+                # Vault too big to cache: fall back to a one-off sort of this scan.
+                entries.sort(key=ORDERINGS[order])
+                return self._list_pager(entries)
+        return lambda offset, limit: self._show(self.cache.page(order, offset, limit))
+
+    def _list_pager(self, entries):
+        """Page source over an already-built list (search results, sorted views)."""
+        return lambda offset, limit: self._show(entries[offset:offset + limit])
+
+    def _pick_entry(self, prompt):
+        """Paged picker shared by copy/edit/delete. Returns the typed ID ('' = back)."""
+        return self.view.page_entries(self._fetch_page, self.db.count_secrets(), prompt)
+
+    def _lookup_entry(self, target_id, with_password=True):
+        """Entry by typed ID. On-screen metadata is reused unless the password is needed."""
+        entry = None if with_password else self._visible.get(target_id)
+        if entry:
+            return dict(entry)
+        return self.get_entry(target_id, with_password)
+
+    def _seal_entry(self, site, username, pwd):
+        """Returns (metadata blob, password blob). The password is bound to its metadata blob."""
+        meta_blob = SecurityManager.encrypt(codec.encode_meta(site, username), self.key)
+        secret_blob = SecurityManager.encrypt(pwd.encode('utf-8'), self.key, SecurityManager.secret_aad(meta_blob))
+        return meta_blob, secret_blob
+
+    def _migrate_split_fields(self):
+        """
+        Re-seals legacy rows (one blob with the password inside) as metadata +
+        password, one transaction per batch. Rows that can't be decrypted are left alone.
+        """
+        legacy = self.db.legacy_ids()
+        if not legacy:
+            return
+
+        self.view.show_message(f"[i] Upgrading {len(legacy)} entries to the split record layout...")
+        for i in range(0, len(legacy), MIGRATE_BATCH_SIZE):
+            rows = self.db.get_blobs(legacy[i:i + MIGRATE_BATCH_SIZE])
+            with self.db.transaction():
+                for entry in self._decrypt_rows(rows):
+                    meta_blob, secret_blob = self._seal_entry(entry['site'], entry['username'], entry.pop('password'))
+                    self.db.update_secret(entry['id'], meta_blob, encrypted_secret=secret_blob)
+        self.cache.clear()
+
+    # --- PACKED MODE (metadata in pages) ---
+    def _is_packed(self):
+        return self.db.get_config("storage_mode") == "pages"
+
+    def _open_page(self, page_no, blob):
+        return SecurityManager.decrypt(blob, self.key, pages.page_aad(page_no))
+
+    def _seal_page(self, page_no, entries):
+        """Writes a whole new page blob (copy-on-write), or drops the page once it is empty."""
+        if not entries:
+            self.db.delete_page(page_no)
+            return
+        blob = SecurityManager.encrypt(pages.pack(entries), self.key, pages.page_aad(page_no))
+        self.db.put_page(page_no, blob, len(entries), [e['id'] for e in entries])
 
+    def _iter_packed_entries(self):
+        """Metadata of every packed entry: one decrypt per page, not per entry."""
+        for page_no, blob in self.db.iter_pages():
+            try:
+                yield from pages.unpack(self._open_page(page_no, blob))
+            except Exception:
+                self.view.show_message(f"[!] Page {page_no} could not be decrypted.")
+
+    def _packed_meta(self, entry_id):
+        found = self.db.page_of(entry_id)
+        return pages.find(self._open_page(*found), entry_id) if found else None
+
+    def _pack_loose_rows(self):
+        """
+        Moves per-row entries into pages, topping up the last page first. Their
+        passwords are re-bound from the (dropped) metadata blob to the entry ID.
+        Returns how many entries were packed.
+        """
+        loose = self.db.loose_ids()
+        if not loose:
+            return 0
+
+        size = int(self.db.get_config("page_records") or pages.PAGE_RECORDS)
+        tail = self.db.tail_page()
+        if tail and tail[1] < size:
+            page_no, entries = tail[0], pages.unpack(self._open_page(tail[0], self.db.get_page(tail[0])))
+        else:
+            page_no, entries = (tail[0] + 1 if tail else 1), []
+
+        packed = 0
+        with self.db.transaction():
+            for row_id in loose:
+                meta_blob, secret_blob, _ = self.db.get_record(row_id)
+                try:
+                    meta = codec.decode_meta(SecurityManager.decrypt(meta_blob, self.key))
+                    pwd = SecurityManager.decrypt(secret_blob, self.key, SecurityManager.secret_aad(meta_blob))
+                except Exception:
+                    self.view.show_message(f"[!] Entry {row_id} could not be decrypted; left unpacked.")
+                    continue
+                self.db.set_secret_blob(row_id, SecurityManager.encrypt(pwd, self.key, pages.secret_aad(row_id)))
+                del pwd
+
+                entries.append({'id': row_id, 'site': meta['site'], 'username': meta['username']})
+                packed += 1
+                if len(entries) == size:
+                    self._seal_page(page_no, entries)
+                    page_no, entries = page_no + 1, []
+            if entries:
+                self._seal_page(page_no, entries)
+        return packed
+
+    def _unpack_entry(self, entry_id):
+        """Takes one entry out of its page (the page is rewritten, or dropped if empty)."""
+        found = self.db.page_of(entry_id)
+        if found:
+            page_no, blob = found
+            self._seal_page(page_no, [e for e in pages.unpack(self._open_page(page_no, blob)) if e['id'] != entry_id])
+
+    def _search_tokens(self, site, username):
+        return [SecurityManager.blind_token(self.index_key, t) for t in search.entry_terms(site, username)]
+
+    def _init_search_index(self):
+        """Derives the index key and (re)builds the blind index if it is missing."""
+        self.index_key = SecurityManager.derive_subkey(self.key, b"search-index")
+
+        if self.db.get_config("search_index") == SEARCH_INDEX_VERSION:
+            return
+
+        entries = self._decrypt_all_entries()
+        with self.db.transaction():
+            self.db.clear_search_index()
+            for entry in entries:
+                self.db.set_search_tokens(entry['id'], self._search_tokens(entry['site'], entry['username']))
+            self.db.save_config("search_index", SEARCH_INDEX_VERSION)
+
+    def _find_entries(self, query):
+        """
+        Indexed lookup: only rows whose tokens match are decrypted.
+        Short queries can't be tokenized and fall back to a full scan, as do
+        packed vaults (where a full scan is one decrypt per page).
+        """
+        if search.is_indexable(query) and not self._is_packed():
+            tokens = [SecurityManager.blind_token(self.index_key, t) for t in search.ngrams(query)]
+            candidates = self._decrypt_rows(self.db.search_blobs(tokens))
+        else:
+            candidates = self._decrypt_all_entries()
+
+        return [e for e in candidates if search.matches(e, query)]
+
+    def _load_vault_params(self):
+        """Returns (salt, validation_blob, agent_vault_id), or None for a new vault."""
+        b64_salt = self.db.get_config("salt")
         if not b64_salt:
+            return None
+        salt = SecurityManager.decode_b64(b64_salt)
+        validation_blob = SecurityManager.decode_b64(self.db.get_config("validation"))
+        return salt, validation_blob, agent.vault_id(salt)
+
+    def _check_credentials(self, mp, sk, salt, validation_blob):
+        """Derives the KEK and checks it against the validation blob. Returns it, or None."""
+        try:
+            kek = SecurityManager.derive_key(mp, sk, salt, self._kdf_params())
+            if SecurityManager.decrypt(validation_blob, kek) == b"VALID":
+                return kek
+        except Exception:
+            pass
+        return None
+
+    def _try_unlock(self, mp, sk, salt, validation_blob, vid):
+        kek = self._check_credentials(mp, sk, salt, validation_blob)
+        if not kek:
+            return False
+
+        self.key = self._unwrap_data_key(kek)
+        agent.store_key(vid, kek)
+        return True
+
+    def _unwrap_data_key(self, kek):
+        """
+        Envelope encryption: entries use a random data key (DEK) wrapped by the KEK.
+        Legacy vaults encrypted entries with the KEK itself, so it simply becomes the
+        DEK and gets wrapped. Migration is O(1), no entry is re-encrypted.
+        """
+        wrapped = self.db.get_config("wrapped_key")
+        if wrapped:
+            return SecurityManager.unwrap_key(SecurityManager.decode_b64(wrapped), kek)
+
+        self.db.save_config("wrapped_key", SecurityManager.encode_b64(SecurityManager.wrap_key(kek, kek)))
+        return kek
+
+    def _kdf_params(self):
+        """Per-vault Argon2id parameters. None means the built-in defaults (older vaults)."""
+        raw = self.db.get_config("kdf_params")
+        return json.loads(raw) if raw else None
+
+    def _seal_vault_keys(self, mp, sk, data_key, kdf_params=None):
+        """
+        Derives a new KEK (fresh salt) from the credentials and re-wraps the DEK.
+        Only 32 bytes are re-encrypted, whatever the vault size.
+        Keeps the current KDF parameters unless new ones are given.
+        """
+        kdf_params = kdf_params or self._kdf_params() or SecurityManager.default_kdf_params()
+        salt = SecurityManager.generate_salt()
+        kek = SecurityManager.derive_key(mp, sk, salt, kdf_params)
+
+        with self.db.transaction():
+            self.db.save_config("kdf_params", json.dumps(kdf_params))
+            self.db.save_config("salt", SecurityManager.encode_b64(salt))
+            self.db.save_config("validation", SecurityManager.encode_b64(SecurityManager.encrypt(b"VALID", kek)))
+            self.db.save_config("wrapped_key", SecurityManager.encode_b64(SecurityManager.wrap_key(data_key, kek)))
+
+        agent.store_key(agent.vault_id(salt), kek)
+
+    def _save_new_entry(self, site, username, pwd):
+        """Encrypts and stores a new entry. Returns its ID."""
+        meta_blob, secret_blob = self._seal_entry(site, username, pwd)
+
+        with self.db.transaction():
+            new_id = self.db.add_secret(meta_blob, self._search_tokens(site, username), secret_blob)
+            if self._is_packed():
+                self._pack_loose_rows()
+        self.cache.put({'id': new_id, 'site': site, 'username': username})
+        return new_id
+
+    def _unlock_from_agent(self, vid, validation_blob):
+        """Uses a key cached by the agent, if any. Stale keys are dropped."""
+        cached = agent.fetch_key(vid)
+        if not cached:
+            return False
+        try:
+            if SecurityManager.decrypt(validation_blob, cached) == b"VALID":
+                self.key = self._unwrap_data_key(cached)
+                return True
+        except Exception:
+            pass
+        agent.forget_key(vid)
+        return False
+
+    # --- FLOWS ---
+    def login_flow(self, credentials=None):
+        """`credentials`: (mp, sk) already typed at an early prompt (see startup.py), used for the first attempt."""
+        params = self._load_vault_params()
+
+        if not params:
             # SETUP FLOW
             mp = self.view.setup_new_vault()
             generated_sk = secrets.token_hex(32)
-            salt = SecurityManager.generate_salt()
 
             self.view.show_secret_key(generated_sk)
 
-            self.key = SecurityManager.derive_key(mp, generated_sk, salt)
-            validation_blob = SecurityManager.encrypt(b"VALID", self.key)
+            self.view.show_message("[i] Calibrating key derivation for this machine...")
+            kdf_params = SecurityManager.calibrate_kdf()
 
-            self.db.save_config("salt", SecurityManager.encode_b64(salt))
-            self.db.save_config("validation", SecurityManager.encode_b64(validation_blob))
+            self.key = SecurityManager.generate_data_key()
+            self._seal_vault_keys(mp, generated_sk, self.key, kdf_params)
             return
 
         # LOGIN FLOW
-        salt = SecurityManager.decode_b64(b64_salt)
-        validation_blob = SecurityManager.decode_b64(self.db.get_config("validation"))
+        salt, validation_blob, vid = params
+
+        with self._op("unlock"):
+            via_agent = self._unlock_from_agent(vid, validation_blob)
+        if via_agent:
+            self.view.show_message("[+] Unlocked via agent.")
+            return
 
         for attempts in range(3, 0, -1):
-            mp, sk = self.view.get_master_credentials(attempts)
-            try:
-                derived_key = SecurityManager.derive_key(mp, sk, salt)
-                check = SecurityManager.decrypt(validation_blob, derived_key)
-                if check == b"VALID":
-                    self.key = derived_key
+            if credentials:
+                (mp, sk), credentials = credentials, None
+            else:
+                mp, sk = self.view.get_master_credentials(attempts)
+            with self._op("unlock"):
+                unlocked = self._try_unlock(mp, sk, salt, validation_blob, vid)
 
-                    del mp
-                    del sk
+            del mp
+            del sk
 
-                    self.view.show_message("[+] Access Granted.")
-                    time.sleep(1)
-                    return
-            except Exception:
-                del mp
-                del sk
+            if unlocked:
+                self.view.show_message("[+] Access Granted.")
+                time.sleep(1)
+                return
 
-                if attempts > 1:
-                    input("\n[-] Invalid credentials. Press Enter to retry...")
+            if attempts > 1:
+                input("\n[-] Invalid credentials. Press Enter to retry...")
 
         sys.exit("\n[!] Security lockout.\n")
 
+    def script_login(self):
+        """
+        Non-interactive unlock: agent first, then VAULT_MASTER_PASSWORD /
+        VAULT_SECRET_KEY, then a single prompt. Exits on failure.
+        """
+        params = self._load_vault_params()
+        if not params:
+            sys.exit("[!] Vault not initialized. Run the app interactively first.")
+
+        salt, validation_blob, vid = params
+        if not self._unlock_from_agent(vid, validation_blob):
+            mp = os.environ.get("VAULT_MASTER_PASSWORD")
+            sk = os.environ.get("VAULT_SECRET_KEY")
+            if mp is None or sk is None:
+                mp, sk = self.view.get_master_credentials(1)
+
+            unlocked = self._try_unlock(mp, sk.strip(), salt, validation_blob, vid)
+            del mp
+            del sk
+            if not unlocked:
+                sys.exit("[!] Invalid credentials.")
+
+        self._migrate_split_fields()
+        self._init_search_index()
+
     def search_entries_flow(self):
         if self._is_vault_empty(): return
 
+        if self.view.can_live_search():
+            self._decrypt_all_entries()
+            if self.cache.is_fresh():
+                self.cache.build_search_index()
+                # Every keystroke is served from the in-session index: no decrypts, no DB.
+                picked = self.view.live_search(self.cache.search)
+                target = self.get_entry(picked['id']) if picked else None
+                if target:
+                    self._copy_password(target)
+                    del target
+                return
+
         while True:
             query = self.view.get_search_query()
             if not query:
-                if 'all_entries' in locals(): del all_entries
                 return
 
-            all_entries = self._decrypt_all_entries()
-
-            results = [
-                e for e in all_entries
-                if query in e['site'].lower() or query in e['username'].lower()
-            ]
+            with self._op("search"):
+                results = self._find_entries(query)
 
             if results:
-                self.view.list_entries(results)
-                self.view.pause()
+                self.view.page_entries(self._list_pager(results), len(results))
 
-                del all_entries
                 del results
+                self._visible = {}
                 return
             else:
-                del all_entries
                 del results
 
                 if not self.view.ask_to_retry():
@@ -144,52 +478,37 @@ class VaultController:
     def view_entries_flow(self):
         if self._is_vault_empty(): return
 
-        entries = self._decrypt_all_entries()
-
+        tip = "[Tip] Remember the ID if you want to Copy or Edit."
         choice = self.view.get_sort_preference()
         match choice:
-            case '2':
-                entries.sort(key=lambda x: x['site'].lower())
-            case '3':
-                entries.sort(key=lambda x: x['username'].lower())
+            case '2' | '3':
+                order = 'site' if choice == '2' else 'username'
+                self.view.page_entries(self._sorted_pager(order), self.db.count_secrets(), tip=tip)
             case _:
-                entries.sort(key=lambda x: x['id'])
+                # ID order comes straight from the primary key: only the visible page is decrypted.
+                self.view.page_entries(self._fetch_page, self.db.count_secrets(), tip=tip)
 
-        self.view.list_entries(entries)
-
-        self.view.show_message("[Tip] Remember the ID if you want to Copy or Edit.")
-        self.view.pause()
-
-        del entries
+        self._visible = {}
 
     def copy_password_flow(self):
         if self._is_vault_empty(): return
 
-        entries = self._decrypt_all_entries()
-        self.view.list_entries(entries)
-
         while True:
-            target_id = self.view.get_input("Enter ID to copy")
+            target_id = self._pick_entry("Enter ID to copy")
             if not target_id:
-                del entries
+                self._visible = {}
                 return
 
-            target = next((e for e in entries if str(e['id']) == target_id), None)
+            with self._op("lookup"):
+                target = self._lookup_entry(target_id)
+            self._visible = {}
 
             if target:
-                pyperclip.copy(target['password'])
-                self.view.show_message(f"[+] Password for {target['site']} copied!")
-                threading.Thread(target=self._clipboard_task, args=(target['password'],), daemon=True).start()
-
-                del target['password']
+                self._copy_password(target)
                 del target
-                del entries
-
-                self.view.pause()
                 return
             else:
                 if not self.view.ask_to_retry():
-                    del entries
                     return
 
     def add_entry_flow(self):
@@ -200,23 +519,13 @@ class VaultController:
 
         if pwd is None:
             pwd = self._generate_password()
-            pyperclip.copy(pwd)
-            self.view.show_message("[+] Password generated and copied to clipboard (clears in 60s).")
-            threading.Thread(target=self._clipboard_task, args=(pwd,), daemon=True).start()
-
-        data = {
-            "site": site,
-            "username": username,
-            "password": pwd
-        }
-        json_bytes = json.dumps(data).encode('utf-8')
-        encrypted_blob = SecurityManager.encrypt(json_bytes, self.key)
+            seconds = self.clipboard.copy(pwd)
+            self.view.show_message(f"[+] Password generated and copied to clipboard (clears in {seconds}s).")
 
-        self.db.add_secret(encrypted_blob)
+        with self._op("save"):
+            self._save_new_entry(site, username, pwd)
 
         del pwd
-        del data
-        del json_bytes
 
         self.view.show_message("[+] Saved.")
         self.view.pause()
@@ -224,16 +533,15 @@ class VaultController:
     def edit_entry_flow(self):
         if self._is_vault_empty(): return
 
-        entries = self._decrypt_all_entries()
-        self.view.list_entries(entries)
-
         while True:
-            target_id = self.view.get_input("Enter ID to edit")
+            target_id = self._pick_entry("Enter ID to edit")
             if not target_id:
-                del entries
+                self._visible = {}
                 return
 
-            target = next((e for e in entries if str(e['id']) == target_id), None)
+            with self._op("lookup"):
+                target = self._lookup_entry(target_id)
+            self._visible = {}
 
             if target:
                 new_site, new_user, change_pwd = self.view.get_edit_values(target['site'], target['username'])
@@ -242,78 +550,572 @@ class VaultController:
                 if change_pwd:
                     if self.view.get_new_password_decision():
                         new_pwd = self._generate_password()
-                        pyperclip.copy(new_pwd)
-                        self.view.show_message("[+] New password generated and copied.")
-                        threading.Thread(target=self._clipboard_task, args=(new_pwd,), daemon=True).start()
+                        seconds = self.clipboard.copy(new_pwd)
+                        self.view.show_message(f"[+] New password generated and copied (clears in {seconds}s).")
                     else:
                         new_pwd = getpass.getpass("New Password: ")
 
-                save_data = {
-                    "site": new_site,
-                    "username": new_user,
-                    "password": new_pwd
-                }
-
-                json_bytes = json.dumps(save_data).encode('utf-8')
-                encrypted_blob = SecurityManager.encrypt(json_bytes, self.key)
-
-                if self.db.update_secret(target_id, encrypted_blob):
-                    self.view.show_message("[+] Entry updated successfully.")
+                meta_blob, secret_blob = self._seal_entry(new_site, new_user, new_pwd)
+
+                tokens = self._search_tokens(new_site, new_user)
+                try:
+                    with self._op("save"), self.db.transaction():
+                        self._unpack_entry(target['id'])
+                        updated = self.db.update_secret(target_id, meta_blob, tokens, secret_blob,
+                                                        expected_version=target['version'])
+                        if updated and self._is_packed():
+                            self._pack_loose_rows()
+                except ConflictError:
+                    # Another session changed the vault: drop our snapshot of it.
+                    self.cache.clear()
+                    self.view.show_message("[!] Entry was changed by another session while you edited it. "
+                                           "Nothing was saved; reopen it to edit the latest version.")
                 else:
-                    self.view.show_message("[-] Database error.")
+                    if updated:
+                        self.cache.put({'id': target['id'], 'site': new_site, 'username': new_user})
+                        self.view.show_message("[+] Entry updated successfully.")
+                    else:
+                        self.view.show_message("[-] Database error.")
 
-                del new_site, new_user
+                del new_site, new_user, target['password']
 
                 if 'new_pwd' in locals(): del new_pwd
 
-                del entries
                 del target
 
                 self.view.pause()
                 return
             else:
                 if not self.view.ask_to_retry():
-                    del entries
                     return
 
     def delete_entry_flow(self):
         if self._is_vault_empty(): return
 
-        entries = self._decrypt_all_entries()
-        self.view.list_entries(entries)
-
         while True:
-            target_id = self.view.get_input("Enter ID to delete")
+            target_id = self._pick_entry("Enter ID to delete")
             if not target_id:
-                del entries
+                self._visible = {}
                 return
 
-            target = next((e for e in entries if str(e['id']) == target_id), None)
+            target = self._lookup_entry(target_id, with_password=False)
+            self._visible = {}
 
             if target:
                 if self.view.confirm_delete(target['site']):
-                    if self.db.delete_secret(target_id):
+                    with self._op("delete"), self.db.transaction():
+                        self._unpack_entry(target['id'])
+                        deleted = self.db.delete_secret(target_id)
+                    if deleted:
+                        self.cache.remove(target['id'])
                         self.view.show_message("[+] Entry deleted.")
                     else:
                         self.view.show_message("[-] Error deleting from database.")
                 else:
                     self.view.show_message("[i] Delete cancelled.")
 
-                del target['password']
                 del target
-                del entries
 
                 self.view.pause()
                 return
             else:
                 if not self.view.ask_to_retry():
-                    del entries
                     return
 
+    # --- SCRIPT API (one-shot commands, see app/cli.py) ---
+    def list_entries(self):
+        entries = self._decrypt_all_entries()
+        entries.sort(key=lambda x: x['id'])
+        return entries
+
+    def search(self, query):
+        return sorted(self._find_entries(query), key=lambda x: x['id'])
+
+    def get_entry(self, entry_id, with_password=True):
+        """
+        One entry by ID with one primary-key read. Metadata comes from the cache
+        when possible; the password blob is only read and decrypted if asked for
+        (along with the row version, for compare-and-swap edits).
+        Returns None if there is no such entry.
+        """
+        try:
+            entry_id = int(entry_id)
+        except (TypeError, ValueError):
+            return None
+
+        if not with_password:
+            if self.cache.is_fresh():
+                return self.cache.get(entry_id)
+            row = self.db.get_blob(entry_id)
+            if row and row[1] is None:
+                return self._packed_meta(entry_id)
+            entries = self._decrypt_rows([row]) if row else []
+            return entries[0] if entries else None
+
+        record = self.db.get_record(entry_id)
+        if not record:
+            return None
+        meta_blob, secret_blob, version = record
+        try:
+            if meta_blob is None:
+                entry = self._packed_meta(entry_id)
+                aad = pages.secret_aad(entry_id)
+            else:
+                entry = codec.decode_meta(SecurityManager.decrypt(meta_blob, self.key))
+                aad = SecurityManager.secret_aad(meta_blob)
+            entry['password'] = SecurityManager.decrypt(secret_blob, self.key, aad).decode('utf-8')
+        except Exception:
+            self.view.show_message(f"[!] Entry {entry_id} could not be decrypted.")
+            return None
+        entry['id'] = entry_id
+        entry['version'] = version
+        return entry
+
+    def resolve_entry(self, ref):
+        """
+        Finds one entry by ID, or by exact (case-insensitive) site name.
+        Raises LookupError if there is no match or the site is ambiguous.
+        """
+        if ref.isdigit():
+            match = [e for e in (self.get_entry(ref, with_password=False),) if e]
+        else:
+            match = [e for e in self._find_entries(ref) if e['site'].lower() == ref.lower()]
+
+        if not match:
+            raise LookupError(f"No entry matches '{ref}'.")
+        if len(match) > 1:
+            ids = ", ".join(str(e['id']) for e in match)
+            raise LookupError(f"'{ref}' is ambiguous (IDs: {ids}). Use an ID.")
+        entry = self.get_entry(match[0]['id'])
+        if not entry:
+            raise LookupError(f"Entry {match[0]['id']} could not be decrypted.")
+        return entry
+
+    def copy_entry(self, ref, timeout=None):
+        """
+        Copies one entry's password without listing the vault. The clear is
+        handed to the agent if one is running (only a salted digest is sent), so the
+        command returns at once; otherwise it waits in the foreground.
+        """
+        entry = self.resolve_entry(ref)
+        seconds = self.clipboard.copy(entry['password'], timeout)
+        value_digest = clipboard.digest(entry['password'])
+        del entry['password']
+
+        if agent.clear_clipboard_later(value_digest, seconds):
+            self.clipboard.cancel()
+            self.view.show_message(f"[+] Password for {entry['site']} copied! The agent clears it in {seconds}s.")
+            return
+
+        self.view.show_message(f"[+] Password for {entry['site']} copied! "
+                               f"Clearing in {seconds}s (Ctrl+C clears now).")
+        try:
+            self.clipboard.wait()
+        finally:
+            self.clipboard.clear()
+
+    def add_entry(self, site, username, pwd=None, length=24):
+        """Stores a new entry, generating the password if none is given. Returns (id, password)."""
+        if pwd is None:
+            pwd = self._generate_password(length)
+        return self._save_new_entry(site, username, pwd), pwd
+
+    def import_entries(self, path, fmt=None, batch_size=None):
+        """
+        Streams an export file into the vault: records are encrypted in batches and
+        each batch is written in one transaction, so memory stays constant.
+        Returns a report dict (imported, skipped rows, seconds, rows/s).
+        """
+        batch_size = batch_size or IMPORT_BATCH_SIZE
+        started = time.perf_counter()
+        imported = 0
+        skipped = []
+        batch = []
+
+        def flush():
+            metas = [codec.encode_meta(site, username) for site, username, _ in batch]
+            meta_blobs = list(SecurityManager.encrypt_many(metas, self.key))
+            secret_blobs = SecurityManager.encrypt_many(
+                (pwd.encode('utf-8') for _, _, pwd in batch), self.key,
+                aads=[SecurityManager.secret_aad(blob) for blob in meta_blobs]
+            )
+            rows = [(meta_blob, secret_blob, self._search_tokens(site, username))
+                    for meta_blob, secret_blob, (site, username, _) in zip(meta_blobs, secret_blobs, batch)]
+            self.db.add_secrets(rows)
+            batch.clear()
+            return len(rows)
+
+        for line_no, record, error in importer.read_records(path, fmt):
+            if error:
+                skipped.append((line_no, error))
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                imported += flush()
+        if batch:
+            imported += flush()
+        if self._is_packed():
+            self._pack_loose_rows()
+
+        self.cache.clear()
+        elapsed = time.perf_counter() - started
+        return {
+            "imported": imported,
+            "skipped": skipped,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(imported / elapsed) if elapsed else imported,
+        }
+
+    def export_backup(self, path):
+        """
+        Streams the whole vault into one encrypted backup file (written atomically).
+        Rows go cursor -> segment -> disk, so memory use doesn't grow with the vault.
+        """
+        path = Path(path)
+        started = time.perf_counter()
+        tables = [[table, self.db.table_columns(table)] for table in BACKUP_TABLES]
+        tmp = path.with_name(path.name + ".tmp")
+
+        try:
+            with open(tmp, 'wb') as f:
+                writer = backup.BackupWriter(f, self.key, self.db.all_config(), tables)
+                for table_no, (table, columns) in enumerate(tables):
+                    for row in self.db.iter_rows(table, columns):
+                        writer.write(table_no, row)
+                writer.close()
+            os.replace(tmp, path)
+        except BaseException:    # incl. Ctrl+C: never leave a partial backup behind
+            tmp.unlink(missing_ok=True)
+            raise
+
+        return {
+            "records": writer.records,
+            "bytes": path.stat().st_size,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def restore_backup(self, path):
+        """
+        Restores a backup into an EMPTY vault: config first (so the usual
+        credentials unlock it), then rows streamed in batched transactions.
+        Any failure leaves the vault empty again.
+        """
+        if self.db.get_config("salt") or self.db.has_secrets():
+            raise backup.BackupError("Restore needs an empty vault. Move the existing data/vault.db away first.")
+
+        started = time.perf_counter()
+        restored = 0
+        with open(path, 'rb') as f:
+            header, aad = backup.read_header(f)
+            for k, v in header["config"].items():
+                self.db.save_config(k, v)
+
+            try:
+                self.script_login()
+
+                batch, target = [], None
+                for table, columns, row in backup.read_records(f, self.key, header, aad):
+                    if target != (table, columns) or len(batch) >= RESTORE_BATCH_SIZE:
+                        if batch:
+                            self.db.insert_rows(*target, batch)
+                        batch, target = [], (table, columns)
+                    batch.append(row)
+                    restored += 1
+                if batch:
+                    self.db.insert_rows(*target, batch)
+                self._migrate_split_fields()
+            except BaseException:
+                self.db.reset()
+                raise
+
+        self.cache.clear()
+        return {"records": restored, "seconds": round(time.perf_counter() - started, 3)}
+
+    def pack_vault(self, page_records=None):
+        """
+        Switches to packed mode: entry metadata moves into encrypted pages of
+        `page_records` entries (one nonce + tag per page, zlib with a preset dictionary).
+        """
+        started = time.perf_counter()
+        self._migrate_split_fields()
+        with self.db.transaction():
+            self.db.save_config("storage_mode", "pages")
+            if page_records:
+                self.db.save_config("page_records", str(page_records))
+            packed = self._pack_loose_rows()
+        self.cache.clear()
+        return {"packed": packed, "pages": sum(1 for _ in self.db.iter_pages()),
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    def unpack_vault(self):
+        """Back to one metadata blob per row. Passwords are re-bound to the new blobs."""
+        started = time.perf_counter()
+        unpacked = 0
+        with self.db.transaction():
+            for page_no, blob in list(self.db.iter_pages()):
+                for entry in pages.unpack(self._open_page(page_no, blob)):
+                    _, secret_blob, _ = self.db.get_record(entry['id'])
+                    pwd = SecurityManager.decrypt(secret_blob, self.key, pages.secret_aad(entry['id'])).decode('utf-8')
+                    meta_blob, secret_blob = self._seal_entry(entry['site'], entry['username'], pwd)
+                    self.db.update_secret(entry['id'], meta_blob, encrypted_secret=secret_blob)
+                    del pwd
+                    unpacked += 1
+                self.db.delete_page(page_no)
+            self.db.save_config("storage_mode", "rows")
+        self.cache.clear()
+        return {"unpacked": unpacked, "seconds": round(time.perf_counter() - started, 3)}
+
+    # --- AUDIT ---
+    def _iter_passwords(self, rows):
+        """
+        Decrypts (id, metadata blob, secret blob) rows in batches on the thread
+        pool. Yields (id, secret blob, password bytes); unreadable rows are skipped.
+        """
+        rows = (((row_id, secret_blob), secret_blob,    # the blob rides along in the row key
+                 pages.secret_aad(row_id) if meta_blob is None else SecurityManager.secret_aad(meta_blob))
+                for row_id, meta_blob, secret_blob in rows)
+        for (row_id, secret_blob), plain, error in SecurityManager.decrypt_many(rows, self.key):
+            if error is None:
+                yield row_id, secret_blob, plain
+
+    def _iter_password_digests(self):
+        """Streams (id, SHA-1 of the password). Each plaintext is hashed and dropped at once."""
+        for row_id, _, plain in self._iter_passwords(self.db.iter_secrets()):
+            yield row_id, breach.sha1(plain)
+
+    def _refresh_audit_cache(self):
+        """
+        Fingerprints the passwords changed since the last audit (see audit.py)
+        and stores the records sealed with the data key. Returns how many.
+        """
+        audit_key = SecurityManager.derive_subkey(self.key, b"password-audit")
+        token = lambda term: SecurityManager.blind_token(audit_key, term)
+        ids, stamps, records = [], [], []
+        for row_id, secret_blob, plain in self._iter_passwords(self.db.stale_audit_rows()):
+            ids.append(row_id)
+            stamps.append(secret_blob[:NONCE_SIZE])
+            records.append(audit.fingerprint(plain.decode('utf-8'), token))
+        sealed = SecurityManager.encrypt_many(records, self.key, aads=[audit.record_aad(i) for i in ids])
+        self.db.put_audit_records(zip(ids, stamps, sealed))
+        return len(ids)
+
+    def audit_vault(self):
+        """
+        Reused, near-duplicate and weak passwords across the vault. Only entries
+        whose password changed since the last run are decrypted; everything else
+        comes from the cached fingerprint records. Groups and weak entries are
+        listed in ID order.
+        """
+        started = time.perf_counter()
+        entries = {e['id']: e for e in self._decrypt_all_entries()}
+        processed = self._refresh_audit_cache()
+        records = {row_id: plain
+                   for row_id, plain, error in SecurityManager.decrypt_many(
+                       ((row_id, blob, audit.record_aad(row_id)) for row_id, blob in self.db.iter_audit_records()),
+                       self.key)
+                   if error is None and row_id in entries}
+        found = audit.report(records)
+        for weak in found['weak']:
+            entry = entries[weak['id']]
+            weak.update(site=entry['site'], username=entry['username'])
+        return {"checked": len(records), "processed": processed, **found,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    def audit_breaches(self, corpus_path=None):
+        """
+        Checks every password against the local breach corpus (see breach.py).
+        Returns the compromised entries in ID order, with how often each
+        password was seen. Unreadable entries are skipped.
+        """
+        started = time.perf_counter()
+        entries = {e['id']: e for e in self._decrypt_all_entries()}
+        compromised = []
+        with breach.BreachCorpus(corpus_path) as corpus:
+            for entry_id, digest in self._iter_password_digests():
+                seen = corpus.count(digest)
+                if seen and entry_id in entries:
+                    entry = entries[entry_id]
+                    compromised.append({"id": entry_id, "site": entry['site'],
+                                        "username": entry['username'], "seen": seen})
+        compromised.sort(key=lambda e: e['id'])
+        return {"checked": len(entries), "compromised": compromised,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    # --- SYNC ---
+    def _check_peer_key(self, peer):
+        """
+        Refuses to merge with a vault sealed under another data key. A fresh
+        (uninitialized) peer becomes a copy of this vault instead.
+        """
+        if not peer.get_config("wrapped_key"):
+            for k, v in self.db.all_config().items():
+                if k != "replica_id":
+                    peer.save_config(k, v)
+            return
+
+        check = peer.get_config("key_check")
+        sample = check and SecurityManager.decode_b64(check)
+        if not sample:
+            first = peer.get_blob_page(0, 1)
+            sample = first and first[0][1]
+        try:
+            if not sample:
+                raise ValueError
+            SecurityManager.decrypt(sample, self.key)
+        except Exception:
+            raise ValueError("The other vault is not a copy of this one (its entries use a different key).")
+        if not check:
+            peer.save_config("key_check", self.db.get_config("key_check"))
+
+    def _synced_tokens(self, state):
+        """Search tokens of an incoming entry. Decrypting also proves the blob belongs to this vault."""
+        try:
+            meta = codec.decode_meta(SecurityManager.decrypt(state[2], self.key))
+        except Exception:
+            raise ValueError("An entry from the other vault could not be decrypted; nothing was synced.")
+        return self._search_tokens(meta['site'], meta['username'])
+
+    @staticmethod
+    def _sync_rank(state):
+        """Merge order: higher version wins; on a tie a delete wins, then the larger blob digest."""
+        if state is None:
+            return (0, 0, b"")
+        version, deleted, meta_blob, secret_blob = state
+        digest = hashlib.sha256((meta_blob or b"") + (secret_blob or b"")).digest()
+        return (version, deleted, digest)
+
+    def sync_vault(self, target):
+        """
+        Two-way sync with another copy of this vault: a vault file, or a directory
+        holding vault.db (a new one is seeded as a copy; a missing target without
+        a suffix is taken as a directory). Only entries changed since the last
+        sync with that copy (read off both change logs) are compared and copied,
+        so the cost follows the number of changes. Blobs move still encrypted;
+        the winner of each entry is picked deterministically (see _sync_rank),
+        so both sides agree.
+        """
+        path = Path(target)
+        if path.is_dir() or (not path.exists() and not path.suffix):
+            path = path / "vault.db"
+        if path.resolve() == self.db.path.resolve():
+            raise ValueError("Can't sync a vault with itself.")
+
+        started = time.perf_counter()
+        report = {"examined": 0, "pulled": 0, "pushed": 0, "conflicts": 0}
+        peer = StorageManager(path)
+        try:
+            if self._is_packed() or peer.get_config("storage_mode") == "pages":
+                raise ValueError("Sync needs per-row entries: run `unpack` on both vaults first.")
+            if not self.db.get_config("key_check"):
+                self.db.save_config("key_check", SecurityManager.encode_b64(SecurityManager.encrypt(b"VALID", self.key)))
+
+            with self.db.transaction(), peer.transaction():
+                self._check_peer_key(peer)
+                ours, theirs = self.db.replica_id(), peer.replica_id()
+                if ours == theirs:      # copied as a plain file: give the copy its own identity
+                    theirs = peer.new_replica_id()
+                their_seq, our_seq = self.db.sync_point(theirs)
+
+                incoming = peer.changed_uids(their_seq)
+                outgoing = self.db.changed_uids(our_seq)
+                both = set(incoming) & set(outgoing)
+                uids = list(dict.fromkeys(incoming + outgoing))
+                report["examined"] = len(uids)
+
+                for uid in uids:
+                    local, remote = self.db.entry_state(uid), peer.entry_state(uid)
+                    if self._sync_rank(local) == self._sync_rank(remote):
+                        continue
+                    if uid in both:
+                        report["conflicts"] += 1
+                    winner, loser_db = (remote, self.db) if self._sync_rank(remote) > self._sync_rank(local) \
+                        else (local, peer)
+                    version, deleted, meta_blob, secret_blob = winner
+                    if deleted:
+                        loser_db.delete_synced(uid, version)
+                    else:
+                        loser_db.put_synced(uid, version, meta_blob, secret_blob, self._synced_tokens(winner))
+                    report["pulled" if loser_db is self.db else "pushed"] += 1
+
+                self.db.save_sync_point(theirs, peer.last_seq(), self.db.last_seq())
+                peer.save_sync_point(ours, self.db.last_seq(), peer.last_seq())
+        finally:
+            peer.close()
+
+        self.cache.clear()
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def close(self):
+        """Closes the DB and drops all key material and decrypted data."""
+        self.db.close()
+        self.cache.clear()
+        self._visible = {}
+        self.key = None
+        self.index_key = None
+
+
+    def change_master_password_flow(self):
+        """
+        Re-wraps the data key under new credentials (optionally a new Secret Key).
+        Entries are untouched, so this costs the same for 10 or 100k entries.
+        """
+        salt, validation_blob, old_vid = self._load_vault_params()
+
+        mp, sk = self.view.get_current_credentials("CHANGE MASTER PASSWORD")
+        if not self._check_credentials(mp, sk, salt, validation_blob):
+            del mp, sk
+            self.view.show_message("[-] Invalid credentials. Nothing changed.")
+            self.view.pause()
+            return
+
+        new_mp = self.view.get_new_master_password()
+        if self.view.confirm_rotate_secret_key():
+            sk = secrets.token_hex(32)
+            self.view.show_secret_key(sk)
+
+        self._seal_vault_keys(new_mp, sk, self.key)
+        agent.forget_key(old_vid)
+
+        del mp, sk, new_mp
+
+        self.view.show_message("[+] Master password changed.")
+        self.view.pause()
+
+    def retune_kdf_flow(self, target_seconds=None):
+        """
+        Re-benchmarks this host and re-wraps the data key with new Argon2id
+        parameters. Needs the credentials (the KEK can't be re-derived without them).
+        """
+        salt, validation_blob, old_vid = self._load_vault_params()
+
+        mp, sk = self.view.get_current_credentials("RE-TUNE KEY DERIVATION")
+        if not self._check_credentials(mp, sk, salt, validation_blob):
+            del mp, sk
+            self.view.show_message("[-] Invalid credentials. Nothing changed.")
+            return False
+
+        self.view.show_message("[i] Calibrating key derivation for this machine...")
+        kdf_params = SecurityManager.calibrate_kdf(target_seconds or KDF_TARGET_SECONDS)
+        self._seal_vault_keys(mp, sk, self.key, kdf_params)
+        agent.forget_key(old_vid)
+
+        del mp, sk
+
+        self.view.show_message(
+            f"[+] KDF re-tuned: {kdf_params['memory_cost'] // 1024} MiB, "
+            f"{kdf_params['time_cost']} passes, {kdf_params['parallelism']} lanes."
+        )
+        return True
+
 
-    def run(self):
+    def run(self, credentials=None):
         try:
-            self.login_flow()
+            self.login_flow(credentials)
+            with self._op("load"):
+                self._migrate_split_fields()
+                self._decrypt_all_entries()
+                self._init_search_index()
             while True:
                 choice = self.view.display_menu()
 
@@ -330,6 +1132,8 @@ class VaultController:
                         self.edit_entry_flow()
                     case '6':
                         self.delete_entry_flow()
+                    case '7':
+                        self.change_master_password_flow()
                     case 'q':
                         break
                     case _:
@@ -337,10 +1141,10 @@ class VaultController:
         except KeyboardInterrupt:
             self.view.show_message("\n[!] Force Exit.")
         finally:
-            self.db.close()
+            self.clipboard.clear()
+            self.close()
             print("\n[*] Database closed.")
 
-            self.key = None
             del self.key
 
             print("[*] Exiting.")
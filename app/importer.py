@@ -0,0 +1,91 @@
+import csv
+import json
+from pathlib import Path
+from urllib.parse import urlparse
+
+# Header aliases of common exports (Bitwarden, Chrome/Edge, Firefox, KeePass, 1Password).
+SITE_COLUMNS = ("name", "title", "site", "website")
+URL_COLUMNS = ("login_uri", "url", "uri", "web site")
+USER_COLUMNS = ("login_username", "username", "user name", "login name", "login", "email")
+PASSWORD_COLUMNS = ("login_password", "password")
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(path):
+    suffix = Path(path).suffix.lower()
+    return "jsonl" if suffix in (".jsonl", ".ndjson") else "csv"
+
+
+def _pick(record, names, strip=True):
+    for name in names:
+        value = record.get(name)
+        if value:
+            return value.strip() if strip else value
+    return ""
+
+
+def _host(url):
+    parsed = urlparse(url if "://" in url else f"//{url}")
+    return parsed.hostname or url
+
+
+def normalize_record(record):
+    """
+    Maps one exported record onto (site, username, password).
+    Raises ValueError if it has no site or no password.
+    """
+    record = {str(k).strip().lower(): v for k, v in record.items() if isinstance(v, str)}
+
+    site = _pick(record, SITE_COLUMNS) or _host(_pick(record, URL_COLUMNS))
+    username = _pick(record, USER_COLUMNS)
+    password = _pick(record, PASSWORD_COLUMNS, strip=False)    # spaces may be part of it
+
+    if not site:
+        raise ValueError("missing site")
+    if not password:
+        raise ValueError("missing password")
+    return site, username, password
+
+
+def _flatten_bitwarden(item):
+    """Bitwarden JSON items keep credentials under 'login'."""
+    login = item.get("login")
+    if isinstance(login, dict):
+        uris = login.get("uris") or [{}]
+        return {
+            "name": item.get("name"),
+            "login_uri": (uris[0] or {}).get("uri"),
+            "login_username": login.get("username"),
+            "login_password": login.get("password"),
+        }
+    return item
+
+
+def read_records(path, fmt=None):
+    """
+    Streams an export file one record at a time.
+    Yields (line_no, (site, username, password) or None, error or None).
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                try:
+                    yield reader.line_num, normalize_record(record), None
+                except ValueError as e:
+                    yield reader.line_num, None, str(e)
+        elif fmt == "jsonl":
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    if not isinstance(item, dict):
+                        raise ValueError("not an object")
+                    yield line_no, normalize_record(_flatten_bitwarden(item)), None
+                except ValueError as e:
+                    yield line_no, None, str(e)
+        else:
+            raise ValueError(f"Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}")
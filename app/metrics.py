@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import functools
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+METRICS_ENV = "VAULT_METRICS"     # "1": print per-phase timings and log them
+PROFILE_ENV = "VAULT_PROFILE"     # path of a cProfile dump for the session
+METRICS_FILE = "metrics.jsonl"
+
+# Phases: kdf (Argon2id), sqlite, aes (AES-GCM), decode (record parsing), render (terminal output).
+# Records hold operation names, phase names, timings and call counts only:
+# never entry data, queries or key material.
+
+_enabled = False
+_path = None
+_current = None    # {phase: [seconds, calls]} of the open operation, or None
+
+
+class _Span:
+    __slots__ = ("phase", "start")
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        _add(self.phase, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _add(phase, seconds, calls=1):
+    if _current is not None:
+        totals = _current.setdefault(phase, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+
+
+def enable(path=None):
+    """Turns recording on. Records go to `path` (default: data/metrics.jsonl)."""
+    global _enabled, _path
+    if path is None:
+        from .storage import DATA_DIR
+        path = DATA_DIR / METRICS_FILE
+    _enabled, _path = True, path
+
+
+def disable():
+    global _enabled, _current
+    _enabled, _current = False, None
+
+
+def enabled_by_env():
+    return os.environ.get(METRICS_ENV, "") not in ("", "0")
+
+
+def span(phase):
+    """Times a block into `phase` of the open operation. Free when nothing is recorded."""
+    return _Span(phase) if _current is not None else _NULL_SPAN
+
+
+def timed(phase):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _current is None:
+                return fn(*args, **kwargs)
+            with _Span(phase):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def timed_iter(phase, iterable):
+    """Charges the time spent producing each item (e.g. cursor fetches) to `phase`."""
+    if _current is None:
+        return iterable
+    return _timed_iter(phase, iter(iterable))
+
+
+def _timed_iter(phase, iterator):
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            _add(phase, time.perf_counter() - start, 0)
+            return
+        _add(phase, time.perf_counter() - start)
+        yield item
+
+
+def format_record(record):
+    parts = [f"[i] {record['op']}: {record['total_ms']} ms"]
+    for phase, stats in record["phases"].items():
+        calls = f" ({stats['calls']})" if stats['calls'] > 1 else ""
+        parts.append(f"{phase} {stats['ms']} ms{calls}")
+    return " | ".join(parts)
+
+
+@contextmanager
+def operation(name, report=None):
+    """
+    Groups the spans of one operation. On exit, appends a record to the metrics
+    file and passes a one-line summary to report(). Nested operations fold into
+    the outer one.
+    """
+    global _current
+    if not _enabled or _current is not None:
+        yield
+        return
+
+    _current = {}
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - start
+        phases, _current = _current, None
+
+        accounted = sum(seconds for seconds, _ in phases.values())
+        phases["other"] = [max(total - accounted, 0.0), 1]
+        record = {
+            "ts": round(time.time(), 3),
+            "op": name,
+            "total_ms": round(total * 1000, 3),
+            "phases": {p: {"ms": round(s * 1000, 3), "calls": c} for p, (s, c) in phases.items()},
+        }
+        try:
+            with open(_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+        if report:
+            report(format_record(record))
+
+
+@contextmanager
+def profiled(path):
+    """Runs the block under cProfile and dumps pstats to `path` (snakeviz / flameprof can read it)."""
+    if not path:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"[i] Profile written to {path}", file=sys.stderr)
@@ -0,0 +1,93 @@
+import zlib
+import struct
+
+from . import codec
+from .security import SECRET_AAD
+
+# --- PAGE FORMAT ---
+# Packed mode stores entry metadata in pages of up to PAGE_RECORDS entries,
+# sealed with ONE nonce + tag per page. Plaintext of a page:
+# VERSION (1) | COUNT (varint) | COUNT x [ID (varint) | END (varint)] | zlib(records)
+# END offsets index the decompressed records (codec metadata records, back to back).
+# IDs sit in the authenticated offset table, so records can't move between entries.
+VERSION = 1
+PAGE_RECORDS = 64
+PAGE_AAD = b"meta-page:"
+
+# Preset dictionary: substrings common in site names and usernames.
+ZDICT = (
+    b"www.login.account.mail.example.org.net.io.co.uk.de"
+    b"@outlook.com@hotmail.com@yahoo.com@icloud.com@proton.me@gmail.com"
+    b"github.com.google.com.amazon.com.microsoft.com.apple.com.com"
+)
+
+
+def page_aad(page_no):
+    return PAGE_AAD + struct.pack(">Q", page_no)
+
+
+def secret_aad(entry_id):
+    """Packed entries have no metadata blob of their own: passwords are bound to the entry ID."""
+    return SECRET_AAD + b"page:" + struct.pack(">Q", entry_id)
+
+
+def _compressor():
+    return zlib.compressobj(9, zdict=ZDICT)
+
+
+def pack(entries):
+    """[{'id', 'site', 'username'}] -> page plaintext."""
+    header = bytearray([VERSION])
+    codec.put_varint(header, len(entries))
+    body = bytearray()
+    for entry in entries:
+        body += codec.encode_meta(entry['site'], entry['username'])
+        codec.put_varint(header, entry['id'])
+        codec.put_varint(header, len(body))
+
+    compressor = _compressor()
+    return bytes(header) + compressor.compress(bytes(body)) + compressor.flush()
+
+
+def _read_table(plain):
+    if not plain or plain[0] != VERSION:
+        raise codec.CodecError("Unsupported page version.")
+    count, pos = codec.get_varint(plain, 1)
+    table = []
+    for _ in range(count):
+        entry_id, pos = codec.get_varint(plain, pos)
+        end, pos = codec.get_varint(plain, pos)
+        table.append((entry_id, end))
+    return table, pos
+
+
+def _records(plain, pos):
+    decompressor = zlib.decompressobj(zdict=ZDICT)
+    return decompressor.decompress(plain[pos:]) + decompressor.flush()
+
+
+def unpack(plain):
+    """Page plaintext -> [{'id', 'site', 'username'}]."""
+    table, pos = _read_table(plain)
+    records = _records(plain, pos)
+    entries = []
+    start = 0
+    for entry_id, end in table:
+        entry = codec.decode_meta(records[start:end])
+        entry['id'] = entry_id
+        entries.append(entry)
+        start = end
+    return entries
+
+
+def find(plain, entry_id):
+    """One entry of a page (looked up in the offset table), or None."""
+    table, pos = _read_table(plain)
+    start = 0
+    for table_id, end in table:
+        if table_id == entry_id:
+            entry = codec.decode_meta(_records(plain, pos)[start:end])
+            entry['id'] = entry_id
+            return entry
+        start = end
+    return None
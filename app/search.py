@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+from itertools import chain, islice
+
+NGRAM_SIZE = 3
+
+
+def normalize(text):
+    return text.strip().lower()
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """Returns the set of overlapping n-grams of a normalized string."""
+    text = normalize(text)
+    if len(text) < n:
+        return set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def entry_terms(site, username):
+    """All searchable n-grams of an entry (site and username are indexed separately)."""
+    return ngrams(site) | ngrams(username)
+
+
+def is_indexable(query):
+    """Queries shorter than one n-gram can't use the index."""
+    return len(normalize(query)) >= NGRAM_SIZE
+
+
+def matches(entry, query):
+    query = normalize(query)
+    return query in entry['site'].lower() or query in entry['username'].lower()
+
+
+# --- LIVE SEARCH (search-as-you-type) ---
+LIVE_GRAM_SIZES = (2, 3)
+DENSE_CANDIDATES = 2000
+
+
+def _prefix_range(sorted_pairs, prefix):
+    """Entries of a sorted [(text, id)] list whose text starts with prefix, in order."""
+    start = bisect_left(sorted_pairs, (prefix,))
+    for text, entry_id in islice(sorted_pairs, start, None):
+        if not text.startswith(prefix):
+            return
+        yield entry_id
+
+
+class TrigramIndex:
+    """
+    In-session index over site/username (plaintext, memory only).
+    Results are ranked: site exact/prefix, username prefix, then substring
+    matches (site before username) ordered by site length. Each tier is read
+    in rank order and stops once the page is full, so a keystroke costs
+    roughly O(log n + limit) instead of a scan-and-sort of every match.
+    """
+
+    def __init__(self):
+        self._fields = {}       # id -> (site, username), lowercased
+        self._site_grams = {}   # 2/3-gram -> {id}
+        self._user_grams = {}
+        self._sites = []        # sorted [(site, id)]
+        self._users = []        # sorted [(username, id)]
+        self._order = []        # sorted [(len(site), site, id)]: substring rank order
+
+    @staticmethod
+    def _grams_of(text):
+        return {g for n in LIVE_GRAM_SIZES for g in ngrams(text, n)}
+
+    def _post(self, entry_id, site, username):
+        for postings, text in ((self._site_grams, site), (self._user_grams, username)):
+            for g in self._grams_of(text):
+                postings.setdefault(g, set()).add(entry_id)
+
+    def add(self, entry):
+        self.remove(entry['id'])
+        entry_id = entry['id']
+        site, username = normalize(entry['site']), normalize(entry['username'])
+        self._fields[entry_id] = (site, username)
+        self._post(entry_id, site, username)
+        insort(self._sites, (site, entry_id))
+        insort(self._users, (username, entry_id))
+        insort(self._order, (len(site), site, entry_id))
+
+    def remove(self, entry_id):
+        fields = self._fields.pop(entry_id, None)
+        if not fields:
+            return
+        site, username = fields
+        for postings, text in ((self._site_grams, site), (self._user_grams, username)):
+            for g in self._grams_of(text):
+                ids = postings[g]
+                ids.discard(entry_id)
+                if not ids:
+                    del postings[g]
+        for pairs, item in ((self._sites, (site, entry_id)),
+                            (self._users, (username, entry_id)),
+                            (self._order, (len(site), site, entry_id))):
+            del pairs[bisect_left(pairs, item)]
+
+    def build(self, entries):
+        for entry in entries:
+            site, username = normalize(entry['site']), normalize(entry['username'])
+            self._fields[entry['id']] = (site, username)
+            self._post(entry['id'], site, username)
+        self._sites = sorted((s, i) for i, (s, _) in self._fields.items())
+        self._users = sorted((u, i) for i, (_, u) in self._fields.items())
+        self._order = sorted((len(s), s, i) for i, (s, _) in self._fields.items())
+
+    def _substring_hits(self, query, postings, field):
+        """Entries whose field contains query, in rank order (shortest site first)."""
+        fields = self._fields
+        candidates = None
+        if len(query) >= min(LIVE_GRAM_SIZES):
+            n = min(len(query), max(LIVE_GRAM_SIZES))
+            sets = sorted((postings.get(g, set()) for g in ngrams(query, n)), key=len)
+            candidates = set.intersection(*sets)
+
+        if candidates is not None and len(candidates) <= DENSE_CANDIDATES:
+            ordered = sorted(candidates, key=lambda i: (len(fields[i][0]), fields[i][0], i))
+        else:
+            ordered = (i for _, _, i in self._order if candidates is None or i in candidates)
+
+        return (i for i in ordered if query in fields[i][field])
+
+    def query(self, query, limit=20):
+        """
+        Returns ([best `limit` ids], more) where `more` is True if there are
+        further matches beyond the page.
+        """
+        query = normalize(query)
+        if not query:
+            return [], False
+
+        tiers = (
+            _prefix_range(self._sites, query),
+            _prefix_range(self._users, query),
+            self._substring_hits(query, self._site_grams, 0),
+            self._substring_hits(query, self._user_grams, 1),
+        )
+        results, seen = [], set()
+        for entry_id in chain.from_iterable(tiers):
+            if entry_id in seen:
+                continue
+            if len(results) == limit:
+                return results, True
+            seen.add(entry_id)
+            results.append(entry_id)
+        return results, False
@@ -1,22 +1,47 @@
 import os
 import sys
+import hmac
+import time
 import base64
+import hashlib
+from collections import deque
+from itertools import islice, repeat
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
 
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
     from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.primitives import hashes
 except ImportError:
     print("[!] Error: 'cryptography' is missing. Run 'uv add cryptography'")
     sys.exit(1)
 
 # --- ARGON2 CONFIGURATION ---
+# Defaults (and the parameters of vaults created before calibration existed).
 MEMORY_COST = 65536
 TIME_COST = 4
 PARALLELISM = 2
 
+# --- CALIBRATION ---
+KDF_TARGET_SECONDS = 1.0
+MIN_MEMORY_COST = 65536          # KiB (64 MiB), never calibrate below this
+MAX_MEMORY_COST = 1048576        # KiB (1 GiB)
+MIN_TIME_COST = 2
+MAX_TIME_COST = 64
+MAX_PARALLELISM = 8
+
 SALT_SIZE = 16
 NONCE_SIZE = 12
 KEY_LENGTH = 32
+TOKEN_LENGTH = 16
+WRAP_AAD = b"vault-data-key"
+SECRET_AAD = b"entry-secret:"
+
+# --- BATCH CONFIGURATION ---
+BATCH_SIZE = 256
 
 class SecurityManager:
     @staticmethod
@@ -25,16 +50,23 @@ class SecurityManager:
         return os.urandom(SALT_SIZE)
 
     @staticmethod
-    def derive_key(master_password: str, secret_key: str, salt: bytes) -> bytes:
+    def default_kdf_params() -> dict:
+        return {"memory_cost": MEMORY_COST, "time_cost": TIME_COST, "parallelism": PARALLELISM}
+
+    @staticmethod
+    @metrics.timed("kdf")
+    def derive_key(master_password: str, secret_key: str, salt: bytes, params: dict = None) -> bytes:
         """
         Derives a 32-byte AES key using Argon2id.
+        `params` are the vault's KDF parameters (defaults if omitted).
         """
+        params = params or SecurityManager.default_kdf_params()
         kdf = Argon2id(
             salt=salt,
             length=KEY_LENGTH,
-            iterations=TIME_COST,
-            lanes=PARALLELISM,
-            memory_cost=MEMORY_COST,
+            iterations=params["time_cost"],
+            lanes=params["parallelism"],
+            memory_cost=params["memory_cost"],
             ad=None,
             secret=None
         )
@@ -43,29 +75,141 @@ class SecurityManager:
         return kdf.derive(combined)
 
     @staticmethod
-    def encrypt(data: bytes, key: bytes) -> bytes:
+    def calibrate_kdf(target_seconds: float = KDF_TARGET_SECONDS) -> dict:
         """
-        Encrypts data using AES-256-GCM.
+        Benchmarks this host and picks Argon2id parameters that take about
+        `target_seconds`: lanes follow the CPU count, memory grows first
+        (memory hardness is what hurts attackers), then passes fill the budget.
+        """
+        lanes = max(1, min(os.cpu_count() or 1, MAX_PARALLELISM))
+        salt = SecurityManager.generate_salt()
+
+        def cost_per_pass(memory_cost):
+            params = {"memory_cost": memory_cost, "time_cost": 1, "parallelism": lanes}
+            start = time.perf_counter()
+            SecurityManager.derive_key("calibration", "", salt, params)
+            return time.perf_counter() - start
+
+        memory_cost = MIN_MEMORY_COST
+        per_pass = cost_per_pass(memory_cost)
+        while per_pass * 2 * MIN_TIME_COST <= target_seconds and memory_cost * 2 <= MAX_MEMORY_COST:
+            memory_cost *= 2
+            per_pass = cost_per_pass(memory_cost)
+
+        time_cost = int(target_seconds / per_pass) if per_pass else MAX_TIME_COST
+        return {
+            "memory_cost": memory_cost,
+            "time_cost": max(MIN_TIME_COST, min(time_cost, MAX_TIME_COST)),
+            "parallelism": lanes,
+        }
+
+    @staticmethod
+    def generate_data_key() -> bytes:
+        """Random data-encryption key (DEK). Entries are encrypted with it."""
+        return os.urandom(KEY_LENGTH)
+
+    @staticmethod
+    def wrap_key(data_key: bytes, kek: bytes) -> bytes:
+        """
+        Encrypts the DEK under the password-derived key (KEK).
         Returns: NONCE + CIPHERTEXT
         """
-        aesgcm = AESGCM(key)
         nonce = os.urandom(NONCE_SIZE)
-        ciphertext = aesgcm.encrypt(nonce, data, None)
-        return nonce + ciphertext
+        return nonce + AESGCM(kek).encrypt(nonce, data_key, WRAP_AAD)
+
+    @staticmethod
+    def unwrap_key(wrapped: bytes, kek: bytes) -> bytes:
+        """Raises InvalidTag if the KEK is wrong or the wrapped key was modified."""
+        return AESGCM(kek).decrypt(wrapped[:NONCE_SIZE], wrapped[NONCE_SIZE:], WRAP_AAD)
+
+    @staticmethod
+    def derive_subkey(key: bytes, label: bytes) -> bytes:
+        """
+        Derives an independent 32-byte key for a specific purpose (HKDF-SHA256).
+        """
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=KEY_LENGTH, salt=None, info=label)
+        return hkdf.derive(key)
+
+    @staticmethod
+    def blind_token(index_key: bytes, term: str) -> bytes:
+        """
+        Keyed HMAC of a search term. Equal terms give equal tokens,
+        but the DB never sees the term itself.
+        """
+        return hmac.new(index_key, term.encode('utf-8'), hashlib.sha256).digest()[:TOKEN_LENGTH]
+
+    @staticmethod
+    @metrics.timed("aes")
+    def encrypt(data: bytes, key: bytes, aad: bytes = None) -> bytes:
+        """
+        Encrypts data using AES-256-GCM.
+        Returns: NONCE + CIPHERTEXT
+        """
+        return _seal(AESGCM(key), data, aad)
 
     @staticmethod
-    def decrypt(blob: bytes, key: bytes) -> bytes:
+    @metrics.timed("aes")
+    def decrypt(blob: bytes, key: bytes, aad: bytes = None) -> bytes:
         """
         Decrypts a blob (NONCE + CIPHERTEXT).
         Raises InvalidTag if decryption fails.
         """
-        if len(blob) < NONCE_SIZE:
-            raise ValueError("Data too short")
+        return _open(AESGCM(key), blob, aad)
+
+    @staticmethod
+    def secret_aad(meta_blob: bytes) -> bytes:
+        """
+        AAD that binds an entry's password blob to its metadata blob (via the
+        metadata nonce), so the two columns can't be swapped between rows.
+        """
+        return SECRET_AAD + meta_blob[:NONCE_SIZE]
+
+    @staticmethod
+    def seal(key: bytes, nonce: bytes, data: bytes, aad: bytes = None) -> bytes:
+        """
+        AES-256-GCM with a caller-chosen nonce (for framed streams).
+        The caller MUST never reuse a nonce under the same key.
+        """
+        return AESGCM(key).encrypt(nonce, data, aad)
+
+    @staticmethod
+    def unseal(key: bytes, nonce: bytes, ciphertext: bytes, aad: bytes = None) -> bytes:
+        """Counterpart of seal(). Raises InvalidTag if anything was modified."""
+        return AESGCM(key).decrypt(nonce, ciphertext, aad)
 
-        nonce = blob[:NONCE_SIZE]
-        ciphertext = blob[NONCE_SIZE:]
+    @staticmethod
+    def encrypt_many(items, key: bytes, workers=None, aads=None):
+        """
+        Encrypts an iterable of plaintexts with one shared cipher.
+        `aads` optionally gives one AAD per item.
+        Yields NONCE + CIPHERTEXT blobs in input order.
+        """
         aesgcm = AESGCM(key)
-        return aesgcm.decrypt(nonce, ciphertext, None)
+
+        def work(chunk):
+            return [_seal(aesgcm, data, aad) for data, aad in chunk]
+
+        return metrics.timed_iter("aes", _run_batched(work, zip(items, aads or repeat(None)), workers))
+
+    @staticmethod
+    def decrypt_many(rows, key: bytes, workers=None):
+        """
+        Decrypts (row_id, blob) pairs with one shared cipher across a thread pool.
+        A row may carry a third item, its AAD.
+        Yields (row_id, plaintext, error) in input order; error is None on success.
+        """
+        aesgcm = AESGCM(key)
+
+        def work(chunk):
+            results = []
+            for row_id, blob, *aad in chunk:
+                try:
+                    results.append((row_id, _open(aesgcm, blob, *aad), None))
+                except Exception as e:
+                    results.append((row_id, None, e))
+            return results
+
+        return metrics.timed_iter("aes", _run_batched(work, rows, workers))
 
     @staticmethod
     def encode_b64(data: bytes) -> str:
@@ -73,4 +217,42 @@ class SecurityManager:
 
     @staticmethod
     def decode_b64(data: str) -> bytes:
-        return base64.b64decode(data)
\ No newline at end of file
+        return base64.b64decode(data)
+
+
+def _seal(aesgcm, data, aad=None):
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + aesgcm.encrypt(nonce, data, aad)
+
+
+def _open(aesgcm, blob, aad=None):
+    if len(blob) < NONCE_SIZE:
+        raise ValueError("Data too short")
+    return aesgcm.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], aad)
+
+
+def _run_batched(work, items, workers=None):
+    """
+    Streams items through work() in chunks of BATCH_SIZE.
+    AES-GCM releases the GIL, so chunks run truly in parallel on the pool.
+    Only a few chunks are in flight at once, so memory stays bounded.
+    """
+    workers = workers or os.cpu_count() or 1
+    items = iter(items)
+
+    if workers == 1:
+        while chunk := list(islice(items, BATCH_SIZE)):
+            yield from work(chunk)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(islice(items, BATCH_SIZE))
+                if not chunk:
+                    break
+                pending.append(pool.submit(work, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+
+from . import agent
+from .storage import DB_FILE
+
+# --- COLD START ---
+# The interactive app shows the unlock prompt first. While the user types,
+# a background thread imports the controller (cryptography, pyperclip) and
+# opens the vault DB (connect, PRAGMAs, schema check).
+
+
+def prompt_first():
+    """
+    True if the unlock prompt can be shown before the vault is opened:
+    the vault exists and no agent socket is present (an agent may unlock
+    without a prompt, and a new vault needs the setup flow instead).
+    """
+    if agent.is_supported() and agent.socket_path().exists():
+        return False
+    return is_initialized()
+
+
+def is_initialized():
+    """
+    True if the vault has been set up (config.salt is set). A DB file alone is
+    not enough: scripting commands and a failed restore leave an empty one.
+    Read-only stdlib sqlite3, so no crypto is loaded on this path.
+    """
+    if not DB_FILE.exists():
+        return False
+    try:
+        conn = sqlite3.connect(f"{DB_FILE.as_uri()}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT 1 FROM config WHERE key = 'salt' AND value != ''").fetchone() is not None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+
+
+class Preload:
+    """Loads the controller and opens the DB on a background thread."""
+
+    def __init__(self):
+        self._controller_cls = None
+        self._db = None
+        self._error = None
+        self._thread = threading.Thread(target=self._load, daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        try:
+            from .controller import VaultController
+            from .storage import StorageManager
+        except BaseException as e:    # the controller's import guards call sys.exit()
+            self._error = e
+            return
+        self._controller_cls = VaultController
+        try:
+            self._db = StorageManager()
+        except Exception:
+            pass    # reopened (and reported) by the controller
+
+    def controller(self, view):
+        """Waits for the preload and returns a VaultController on the opened DB."""
+        self._thread.join()
+        if self._error:
+            raise self._error
+        return self._controller_cls(view=view, db=self._db)
@@ -1,6 +1,13 @@
+import os
 import sys
+import time
+import hashlib
+import random
 import sqlite3
 from pathlib import Path
+from contextlib import contextmanager
+
+from . import metrics
 
 def get_base_dir():
     if getattr(sys, 'frozen', False):
@@ -14,67 +21,557 @@ BASE_DIR = get_base_dir()
 DATA_DIR = BASE_DIR / "data"
 DB_FILE = DATA_DIR / "vault.db"
 
+# Tables carried by backups (in restore order).
+BACKUP_TABLES = ("secrets", "search_index", "meta_pages", "changes")
+
+# Stays under SQLite's default host-parameter limit on older builds.
+MAX_SQL_VARIABLES = 900
+
+# Audit records are stamped with the head of the secret blob they came from:
+# its AES-GCM nonce (see security.NONCE_SIZE).
+AUDIT_STAMP_SIZE = 12
+
+# --- SQLITE TUNING ---
+# WAL + NORMAL: one fsync per checkpoint instead of per commit, still crash-safe.
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16384),           # KiB (16 MiB page cache)
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+# --- CONCURRENCY ---
+# Several processes may open the same vault. Writers queue on SQLite's lock for
+# up to BUSY_TIMEOUT seconds, then retry BEGIN with jittered backoff.
+BUSY_TIMEOUT = 10.0
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.05
+
+
+class ConflictError(Exception):
+    """A compare-and-swap write found the row changed by another writer."""
+
 class StorageManager:
-    def __init__(self):
+    def __init__(self, path=None):
+        """`path`: another vault file (e.g. a sync peer). Defaults to data/vault.db."""
+        path = Path(path) if path else DB_FILE
+        self.path = path
         # Ensure the 'data' folder exists before connecting
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
 
-        self.conn = sqlite3.connect(str(DB_FILE))
-        self.cursor = self.conn.cursor()
+        # May be opened on the startup thread and used on the main one (never concurrently).
+        self.conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._tx_depth = 0
+        for name, value in PRAGMAS:
+            self.conn.execute(f"PRAGMA {name} = {value}")
         self._init_db()
 
+    @contextmanager
+    def transaction(self):
+        """
+        Groups many writes into ONE commit. Nests: only the outermost block
+        commits, and an exception anywhere rolls the whole group back.
+        """
+        if self._tx_depth == 0 and not self.conn.in_transaction:
+            self._begin()
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.rollback()
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self.conn.commit()
+
+    def _begin(self):
+        """
+        BEGIN IMMEDIATE takes the write lock up front, so reads inside a
+        transaction (versions, the tail page, loose rows) can't be invalidated
+        by another process before commit. The implicit BEGIN only starts at the
+        first write.
+        """
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == BUSY_RETRIES:
+                    raise
+                time.sleep(BUSY_BACKOFF * 2 ** attempt * (1 + random.random()))
+
     def _init_db(self):
-        self.cursor.execute("""
+        with self.transaction():
+            self._create_schema()
+
+    def _create_schema(self):
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS config (
                 key TEXT PRIMARY KEY,
                 value TEXT
             )
         """)
-        # Just one blob.
-        self.cursor.execute("""
+        # Display metadata and password are sealed separately, so listings never
+        # decrypt passwords. encrypted_secret IS NULL marks a legacy single-blob row.
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS secrets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 encrypted_data BLOB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                encrypted_secret BLOB,
+                page_no INTEGER,
+                version INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        # Packed mode: metadata lives in meta_pages and encrypted_data is NULL.
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta_pages (
+                page_no INTEGER PRIMARY KEY,
+                encrypted_page BLOB NOT NULL,
+                records INTEGER NOT NULL
+            )
+        """)
+        columns = self.table_columns("secrets")
+        if "encrypted_secret" not in columns:
+            self.conn.execute("ALTER TABLE secrets ADD COLUMN encrypted_secret BLOB")
+        if "page_no" not in columns:
+            self.conn.execute("ALTER TABLE secrets ADD COLUMN page_no INTEGER")
+        if "version" not in columns:
+            self.conn.execute("ALTER TABLE secrets ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        # uid: identity of an entry across copies of the vault (row IDs differ between hosts).
+        if "uid" not in columns:
+            self.conn.execute("ALTER TABLE secrets ADD COLUMN uid TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_secrets_page ON secrets (page_no)")
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_secrets_uid ON secrets (uid)")
+        # Change log: one row per entry, re-sequenced on every write. Deleted
+        # entries stay as tombstones, so deletes reach other copies too.
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL UNIQUE,
+                version INTEGER NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Sync points: the last change seen from / sent to each peer copy.
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_peers (
+                replica_id TEXT PRIMARY KEY,
+                their_seq INTEGER NOT NULL,
+                our_seq INTEGER NOT NULL
+            )
+        """)
+        # Blind index: HMAC tokens of n-grams -> secret ID. No plaintext.
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_index (
+                token BLOB NOT NULL,
+                secret_id INTEGER NOT NULL,
+                PRIMARY KEY (token, secret_id)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_search_secret ON search_index (secret_id)"
+        )
+        # Password audit cache: one encrypted fingerprint record per entry (see
+        # audit.py). stamp is the nonce of the secret blob it was computed from:
+        # every re-seal draws a new nonce, so a changed password shows up as stale.
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS audit_cache (
+                secret_id INTEGER PRIMARY KEY,
+                stamp BLOB NOT NULL,
+                record BLOB NOT NULL
             )
         """)
-        self.conn.commit()
+        if not self.get_config("replica_id"):
+            self.new_replica_id()
+        self._backfill_uids()
+
+    def _backfill_uids(self):
+        """
+        Gives rows written before uids (or restored from an old backup) a uid
+        and a change-log entry. The uid is a hash of the row's blob, so copies
+        of one vault made before the upgrade agree on it.
+        """
+        rows = self.conn.execute(
+            "SELECT id, COALESCE(encrypted_secret, encrypted_data) FROM secrets WHERE uid IS NULL"
+        ).fetchall()
+        for row_id, blob in rows:
+            self.conn.execute("UPDATE secrets SET uid = ? WHERE id = ?",
+                              (hashlib.sha256(blob).hexdigest()[:32], row_id))
+        self._log_changes(row_id for row_id, _ in rows)
+
+    def _log_changes(self, secret_ids):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO changes (uid, version, deleted) SELECT uid, version, 0 FROM secrets WHERE id = ?",
+            ((secret_id,) for secret_id in secret_ids)
+        )
 
     def save_config(self, key, value):
-        self.cursor.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
-        self.conn.commit()
+        with self.transaction():
+            self.conn.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
 
     def get_config(self, key):
-        self.cursor.execute("SELECT value FROM config WHERE key=?", (key,))
-        result = self.cursor.fetchone()
+        result = self.conn.execute("SELECT value FROM config WHERE key=?", (key,)).fetchone()
         return result[0] if result else None
 
-    def add_secret(self, encrypted_blob):
-        self.cursor.execute(
-            "INSERT INTO secrets (encrypted_data) VALUES (?)",
-            (encrypted_blob,)
+    @metrics.timed("sqlite")
+    def add_secret(self, encrypted_blob, tokens=None, encrypted_secret=None):
+        with self.transaction():
+            new_id = self.conn.execute(
+                "INSERT INTO secrets (encrypted_data, encrypted_secret, uid) VALUES (?, ?, ?)",
+                (encrypted_blob, encrypted_secret, os.urandom(16).hex())
+            ).lastrowid
+            if tokens is not None:
+                self._write_tokens(new_id, tokens)
+            self._log_changes([new_id])
+        return new_id
+
+    @metrics.timed("sqlite")
+    def add_secrets(self, rows):
+        """
+        Inserts many (encrypted_blob, encrypted_secret, tokens) rows in ONE
+        transaction (one fsync). Rolls back the whole batch on error. Returns the new IDs.
+        """
+        ids = []
+        token_rows = []
+        with self.transaction():
+            for encrypted_blob, encrypted_secret, tokens in rows:
+                new_id = self.conn.execute(
+                    "INSERT INTO secrets (encrypted_data, encrypted_secret, uid) VALUES (?, ?, ?)",
+                    (encrypted_blob, encrypted_secret, os.urandom(16).hex())
+                ).lastrowid
+                ids.append(new_id)
+                token_rows.extend((token, new_id) for token in tokens)
+
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO search_index (token, secret_id) VALUES (?, ?)",
+                token_rows
+            )
+            self._log_changes(ids)
+        return ids
+
+    @metrics.timed("sqlite")
+    def update_secret(self, secret_id, encrypted_blob, tokens=None, encrypted_secret=None, expected_version=None):
+        """
+        Replaces both blobs (and optionally the search tokens) for a specific ID.
+        The two are always written together: the secret is bound to its metadata blob.
+        The entry becomes a per-row entry again (its page, if any, is rewritten by the caller).
+        Every update bumps the row's version. With expected_version the update is a
+        compare-and-swap: ConflictError if another writer got there first.
+        """
+        with self.transaction():
+            updated = self.conn.execute("""
+                UPDATE secrets SET encrypted_data = ?, encrypted_secret = ?, page_no = NULL, version = version + 1
+                WHERE id = ? AND (? IS NULL OR version = ?)
+            """, (encrypted_blob, encrypted_secret, secret_id, expected_version, expected_version)).rowcount > 0
+            if not updated and expected_version is not None and self.get_version(secret_id) is not None:
+                raise ConflictError(f"Entry {secret_id} was changed by another session.")
+            if updated and tokens is not None:
+                self._write_tokens(secret_id, tokens)
+            if updated:
+                self._log_changes([secret_id])
+        return updated
+
+    def _write_tokens(self, secret_id, tokens):
+        self.conn.execute("DELETE FROM search_index WHERE secret_id = ?", (secret_id,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO search_index (token, secret_id) VALUES (?, ?)",
+            ((token, secret_id) for token in tokens)
         )
-        self.conn.commit()
 
-    def update_secret(self, secret_id, encrypted_blob):
-        """Updates the blob for a specific ID."""
-        self.cursor.execute(
-            "UPDATE secrets SET encrypted_data = ? WHERE id = ?",
-            (encrypted_blob, secret_id)
+    def set_search_tokens(self, secret_id, tokens):
+        with self.transaction():
+            self._write_tokens(secret_id, tokens)
+
+    def clear_search_index(self):
+        with self.transaction():
+            self.conn.execute("DELETE FROM search_index")
+
+    @metrics.timed("sqlite")
+    def search_blobs(self, tokens):
+        """
+        Returns (id, blob) for rows that carry ALL the given tokens.
+        Candidates only: the caller still verifies after decryption.
+        """
+        tokens = list(set(tokens))
+        if not tokens:
+            return []
+        placeholders = ", ".join("?" * len(tokens))
+        return self.conn.execute(f"""
+            SELECT id, encrypted_data FROM secrets WHERE id IN (
+                SELECT secret_id FROM search_index
+                WHERE token IN ({placeholders})
+                GROUP BY secret_id
+                HAVING COUNT(*) = ?
+            )
+        """, (*tokens, len(tokens))).fetchall()
+
+    def iter_blobs(self):
+        """
+        Streams (id, blob) rows off a cursor, without materializing the table.
+        Packed rows (metadata in a page) are skipped: see iter_pages().
+        """
+        yield from metrics.timed_iter(
+            "sqlite", self.conn.execute("SELECT id, encrypted_data FROM secrets WHERE encrypted_data IS NOT NULL")
+        )
+
+    def iter_secrets(self):
+        """Streams (id, metadata blob, secret blob) of split-layout rows (metadata is NULL when packed)."""
+        yield from metrics.timed_iter(
+            "sqlite", self.conn.execute(
+                "SELECT id, encrypted_data, encrypted_secret FROM secrets WHERE encrypted_secret IS NOT NULL"
+            )
         )
-        self.conn.commit()
-        return self.cursor.rowcount > 0
 
     def get_all_blobs(self):
         """Returns the raw encrypted blobs. Decryption happens in main.py"""
-        self.cursor.execute("SELECT id, encrypted_data FROM secrets")
-        return self.cursor.fetchall()
+        return list(self.iter_blobs())
+
+    def count_secrets(self):
+        return self.conn.execute("SELECT COUNT(*) FROM secrets").fetchone()[0]
+
+    @metrics.timed("sqlite")
+    def get_blob_page(self, offset, limit):
+        """One page of (id, blob) rows in ID order (served by the primary key index)."""
+        return self.conn.execute(
+            "SELECT id, encrypted_data FROM secrets ORDER BY id LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
 
+    @metrics.timed("sqlite")
+    def get_record(self, secret_id):
+        """(metadata blob, secret blob, version) of one row, or None."""
+        return self.conn.execute(
+            "SELECT encrypted_data, encrypted_secret, version FROM secrets WHERE id = ?", (secret_id,)
+        ).fetchone()
+
+    def get_version(self, secret_id):
+        row = self.conn.execute("SELECT version FROM secrets WHERE id = ?", (secret_id,)).fetchone()
+        return row[0] if row else None
+
+    def legacy_ids(self):
+        """IDs of rows still in the single-blob layout (password inside the metadata blob)."""
+        return [row[0] for row in self.conn.execute("SELECT id FROM secrets WHERE encrypted_secret IS NULL")]
+
+    @metrics.timed("sqlite")
+    def get_blob(self, secret_id):
+        """(id, metadata blob) of one row via the primary key, or None."""
+        return self.conn.execute(
+            "SELECT id, encrypted_data FROM secrets WHERE id = ?", (secret_id,)
+        ).fetchone()
+
+    @metrics.timed("sqlite")
+    def get_blobs(self, secret_ids):
+        """(id, blob) rows for the given IDs, in ID order. Missing IDs are skipped."""
+        secret_ids = sorted(set(secret_ids))
+        rows = []
+        for i in range(0, len(secret_ids), MAX_SQL_VARIABLES):
+            chunk = secret_ids[i:i + MAX_SQL_VARIABLES]
+            placeholders = ", ".join("?" * len(chunk))
+            rows += self.conn.execute(
+                f"SELECT id, encrypted_data FROM secrets WHERE id IN ({placeholders}) ORDER BY id", chunk
+            )
+        return rows
+
+    def has_secrets(self):
+        return self.conn.execute("SELECT 1 FROM secrets LIMIT 1").fetchone() is not None
+
+    # --- META PAGES (packed mode) ---
+    def iter_pages(self):
+        """Streams (page_no, blob) for every metadata page."""
+        yield from metrics.timed_iter(
+            "sqlite", self.conn.execute("SELECT page_no, encrypted_page FROM meta_pages ORDER BY page_no")
+        )
+
+    @metrics.timed("sqlite")
+    def get_page(self, page_no):
+        return self.conn.execute(
+            "SELECT encrypted_page FROM meta_pages WHERE page_no = ?", (page_no,)
+        ).fetchone()[0]
+
+    @metrics.timed("sqlite")
+    def page_of(self, secret_id):
+        """(page_no, page blob) holding an entry's metadata, or None if it isn't packed."""
+        return self.conn.execute("""
+            SELECT p.page_no, p.encrypted_page FROM secrets s
+            JOIN meta_pages p ON p.page_no = s.page_no WHERE s.id = ?
+        """, (secret_id,)).fetchone()
+
+    def tail_page(self):
+        """(page_no, records) of the last page, or None."""
+        return self.conn.execute(
+            "SELECT page_no, records FROM meta_pages ORDER BY page_no DESC LIMIT 1"
+        ).fetchone()
+
+    @metrics.timed("sqlite")
+    def put_page(self, page_no, blob, records, secret_ids):
+        """
+        Writes a whole page (a fresh blob, never patched in place) and points its
+        entries at it, dropping their per-row metadata blobs.
+        """
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta_pages (page_no, encrypted_page, records) VALUES (?, ?, ?)",
+                (page_no, blob, records)
+            )
+            self.conn.executemany(
+                "UPDATE secrets SET page_no = ?, encrypted_data = NULL WHERE id = ?",
+                ((page_no, secret_id) for secret_id in secret_ids)
+            )
+
+    def delete_page(self, page_no):
+        with self.transaction():
+            self.conn.execute("DELETE FROM meta_pages WHERE page_no = ?", (page_no,))
+
+    def set_secret_blob(self, secret_id, encrypted_secret):
+        with self.transaction():
+            self.conn.execute("UPDATE secrets SET encrypted_secret = ? WHERE id = ?", (encrypted_secret, secret_id))
+
+    def loose_ids(self):
+        """IDs of split-layout rows that are not in a page yet."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT id FROM secrets WHERE encrypted_data IS NOT NULL AND encrypted_secret IS NOT NULL ORDER BY id"
+        )]
+
+    @metrics.timed("sqlite")
     def delete_secret(self, secret_id):
-        self.cursor.execute("DELETE FROM secrets WHERE id = ?", (secret_id,))
-        count = self.cursor.rowcount
-        self.conn.commit()
+        with self.transaction():
+            self.conn.execute("""
+                INSERT OR REPLACE INTO changes (uid, version, deleted)
+                SELECT uid, version + 1, 1 FROM secrets WHERE id = ?
+            """, (secret_id,))
+            count = self.conn.execute("DELETE FROM secrets WHERE id = ?", (secret_id,)).rowcount
+            self.conn.execute("DELETE FROM search_index WHERE secret_id = ?", (secret_id,))
         return count > 0
 
+    # --- AUDIT CACHE ---
+    def stale_audit_rows(self):
+        """
+        Streams (id, metadata blob, secret blob) of rows whose audit record is
+        missing or was computed from an older secret blob.
+        """
+        yield from metrics.timed_iter("sqlite", self.conn.execute(f"""
+            SELECT s.id, s.encrypted_data, s.encrypted_secret FROM secrets s
+            LEFT JOIN audit_cache a ON a.secret_id = s.id
+            WHERE s.encrypted_secret IS NOT NULL
+              AND (a.stamp IS NULL OR a.stamp != substr(s.encrypted_secret, 1, {AUDIT_STAMP_SIZE}))
+        """))
+
+    def put_audit_records(self, rows):
+        """Writes (id, stamp, encrypted record) rows and drops records of deleted entries."""
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO audit_cache (secret_id, stamp, record) VALUES (?, ?, ?)", rows
+            )
+            self.conn.execute("DELETE FROM audit_cache WHERE secret_id NOT IN (SELECT id FROM secrets)")
+
+    def iter_audit_records(self):
+        """Streams (id, encrypted record) of live entries."""
+        yield from metrics.timed_iter("sqlite", self.conn.execute(
+            "SELECT a.secret_id, a.record FROM audit_cache a JOIN secrets s ON s.id = a.secret_id"
+        ))
+
+    # --- SYNC ---
+    def replica_id(self):
+        return self.get_config("replica_id")
+
+    def new_replica_id(self):
+        """A fresh identity, e.g. for a vault that was copied as a plain file."""
+        replica = os.urandom(16).hex()
+        self.save_config("replica_id", replica)
+        return replica
+
+    def last_seq(self):
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changed_uids(self, since):
+        """uids of entries written or deleted after change `since` (a range scan of the log)."""
+        return [row[0] for row in self.conn.execute("SELECT uid FROM changes WHERE seq > ? ORDER BY seq", (since,))]
+
+    def entry_state(self, uid):
+        """(version, deleted, metadata blob, secret blob) of an entry, a tombstone, or None."""
+        row = self.conn.execute(
+            "SELECT version, 0, encrypted_data, encrypted_secret FROM secrets WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row:
+            return row
+        return self.conn.execute(
+            "SELECT version, 1, NULL, NULL FROM changes WHERE uid = ? AND deleted = 1", (uid,)
+        ).fetchone()
+
+    def put_synced(self, uid, version, encrypted_blob, encrypted_secret, tokens):
+        """Writes an entry received from another copy, keeping its uid and version."""
+        with self.transaction():
+            row = self.conn.execute("SELECT id FROM secrets WHERE uid = ?", (uid,)).fetchone()
+            if row:
+                secret_id = row[0]
+                self.conn.execute("""
+                    UPDATE secrets SET encrypted_data = ?, encrypted_secret = ?, page_no = NULL, version = ?
+                    WHERE id = ?
+                """, (encrypted_blob, encrypted_secret, version, secret_id))
+            else:
+                secret_id = self.conn.execute(
+                    "INSERT INTO secrets (encrypted_data, encrypted_secret, uid, version) VALUES (?, ?, ?, ?)",
+                    (encrypted_blob, encrypted_secret, uid, version)
+                ).lastrowid
+            self._write_tokens(secret_id, tokens)
+            self._log_changes([secret_id])
+        return secret_id
+
+    def delete_synced(self, uid, version):
+        """Applies a tombstone received from another copy."""
+        with self.transaction():
+            row = self.conn.execute("SELECT id FROM secrets WHERE uid = ?", (uid,)).fetchone()
+            if row:
+                self.conn.execute("DELETE FROM secrets WHERE id = ?", (row[0],))
+                self.conn.execute("DELETE FROM search_index WHERE secret_id = ?", (row[0],))
+            self.conn.execute("INSERT OR REPLACE INTO changes (uid, version, deleted) VALUES (?, ?, 1)",
+                              (uid, version))
+
+    def sync_point(self, replica_id):
+        """(their_seq, our_seq) at the last sync with that copy, or (0, 0)."""
+        row = self.conn.execute(
+            "SELECT their_seq, our_seq FROM sync_peers WHERE replica_id = ?", (replica_id,)
+        ).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def save_sync_point(self, replica_id, their_seq, our_seq):
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_peers (replica_id, their_seq, our_seq) VALUES (?, ?, ?)",
+                (replica_id, their_seq, our_seq)
+            )
+
+    # --- BULK / BACKUP ---
+    def all_config(self):
+        return dict(self.conn.execute("SELECT key, value FROM config"))
+
+    def table_columns(self, table):
+        return [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+
+    def iter_rows(self, table, columns):
+        """Streams rows straight off a cursor (no fetchall)."""
+        cols = ", ".join(columns)
+        yield from self.conn.execute(f"SELECT {cols} FROM {table}")
+
+    def insert_rows(self, table, columns, rows):
+        """Inserts raw rows (e.g. from a backup) in one transaction."""
+        cols = ", ".join(columns)
+        placeholders = ", ".join("?" * len(columns))
+        with self.transaction():
+            self.conn.executemany(f"INSERT INTO {table} ({cols}) VALUES ({placeholders})", rows)
+            if table == "secrets":
+                self._backfill_uids()
+
+    def reset(self):
+        """Deletes everything, including config. Used to undo a failed restore."""
+        self.conn.rollback()
+        with self.transaction():
+            for table in ("config", "sync_peers", "audit_cache") + BACKUP_TABLES:
+                self.conn.execute(f"DELETE FROM {table}")
+
     def close(self):
         self.conn.close()
\ No newline at end of file
@@ -1,6 +1,18 @@
 import os
+import sys
+import time
 import getpass
 
+try:
+    import curses
+except ImportError:
+    curses = None  # e.g. Windows without windows-curses: live search falls back to the prompt
+
+from . import metrics
+
+PAGE_SIZE = 20
+LIVE_HEADER_ROWS = 3
+
 class VaultView:
     @staticmethod
     def clear_screen():
@@ -38,6 +50,7 @@ class VaultView:
         print("4. Add Password")
         print("5. Edit Entry")
         print("6. Delete")
+        print("7. Change Master Password")
         print("q. Quit")
         return input("\nChoice: ").strip()
 
@@ -49,6 +62,10 @@ class VaultView:
         print("║      NEW VAULT SETUP INITIALIZED       ║")
         print("╚════════════════════════════════════════╝")
 
+        return self.get_new_master_password()
+
+
+    def get_new_master_password(self):
         while True:
             mp = getpass.getpass("1. Choose Master Password (min 8 chars): ")
             if len(mp) < 8:
@@ -77,6 +94,23 @@ class VaultView:
         return mp, sk
 
 
+    def get_current_credentials(self, title):
+        self.clear_screen()
+
+        print(f"--- {title} ---")
+        print("Confirm your current credentials first.\n")
+
+        mp = getpass.getpass("Current Master Password: ")
+        sk = getpass.getpass("Current Secret Key: ").strip()
+        return mp, sk
+
+
+    def confirm_rotate_secret_key(self):
+        """Returns True if a new Secret Key should be generated as well."""
+        return input("\nAlso rotate the Secret Key? (y/n): ").strip().lower() == 'y'
+
+
+    @metrics.timed("render")
     def list_entries(self, entries):
         """Expects a list of dicts: {'id', 'site', 'username'}"""
         self.clear_screen()
@@ -88,6 +122,37 @@ class VaultView:
             print(f"{entry['id']:<5} {entry['site']:<25} {entry['username']:<25} {masked_pwd}")
 
 
+    def page_entries(self, fetch_page, total, prompt=None, tip=None):
+        """
+        Paged listing: fetch_page(offset, limit) returns the entries of one page,
+        so only that page is ever decrypted.
+        Browse mode (no prompt): returns when the user presses Enter.
+        Picker mode: returns whatever else the user typed (an ID), or '' to go back.
+        """
+        pages = max(1, -(-total // PAGE_SIZE))
+        page = 0
+
+        while True:
+            with metrics.operation("page", self.show_message):
+                self.list_entries(fetch_page(page * PAGE_SIZE, PAGE_SIZE))
+            print(f"\nPage {page + 1}/{pages} ({total} entries)   [n] Next  [p] Prev  [j <page>] Jump")
+            if tip:
+                print(tip)
+
+            choice = self.get_input(prompt or "Command").lower()
+            match choice.split():
+                case []:
+                    return ''
+                case ['n']:
+                    page = min(page + 1, pages - 1)
+                case ['p']:
+                    page = max(page - 1, 0)
+                case ['j', number] if number.isdigit():
+                    page = min(max(int(number) - 1, 0), pages - 1)
+                case _ if prompt:
+                    return choice
+
+
     def get_search_query(self):
         self.clear_screen()
 
@@ -95,6 +160,74 @@ class VaultView:
         return self.get_input("Search term (Site/User)").lower()
 
 
+    @staticmethod
+    def can_live_search():
+        return curses is not None and sys.stdin.isatty() and sys.stdout.isatty()
+
+
+    def live_search(self, run_query):
+        """
+        Search-as-you-type screen. run_query(query, limit) returns ([entries], more).
+        Returns the entry picked with Enter, or None on Esc.
+        """
+        os.environ.setdefault("ESCDELAY", "25")
+        return curses.wrapper(self._live_search_loop, run_query)
+
+
+    def _live_search_loop(self, screen, run_query):
+        query, selected = "", 0
+        results, more, elapsed = [], False, 0.0
+        dirty = False
+
+        while True:
+            height, width = screen.getmaxyx()
+            if dirty:
+                start = time.perf_counter()
+                results, more = run_query(query, max(height - LIVE_HEADER_ROWS, 1)) if query else ([], False)
+                elapsed = (time.perf_counter() - start) * 1000
+                selected, dirty = 0, False
+
+            self._draw_live_search(screen, query, results, more, selected, elapsed, width)
+
+            key = screen.get_wch()
+            match key:
+                case '\x1b':
+                    return None
+                case '\n' | '\r' | curses.KEY_ENTER:
+                    if results:
+                        return results[selected]
+                case curses.KEY_UP:
+                    selected = max(selected - 1, 0)
+                case curses.KEY_DOWN:
+                    selected = min(selected + 1, max(len(results) - 1, 0))
+                case curses.KEY_BACKSPACE | '\x7f' | '\b':
+                    query, dirty = query[:-1], True
+                case str() if key.isprintable():
+                    query, dirty = query + key, True
+
+
+    @staticmethod
+    @metrics.timed("render")
+    def _draw_live_search(screen, query, results, more, selected, elapsed, width):
+        count = f"{len(results)}{'+' if more else ''} matches"
+        lines = [
+            f"--- LIVE SEARCH ---  {count} ({elapsed:.2f} ms)   [Up/Down] Select  [Enter] Copy  [Esc] Back",
+            f"{'ID':<5} {'WEBSITE':<25} {'USERNAME':<25}",
+        ]
+        screen.erase()
+        try:
+            screen.addnstr(0, 0, lines[0], width - 1)
+            screen.addnstr(2, 0, lines[1], width - 1)
+            for row, entry in enumerate(results):
+                attr = curses.A_REVERSE if row == selected else curses.A_NORMAL
+                screen.addnstr(LIVE_HEADER_ROWS + row, 0,
+                               f"{entry['id']:<5} {entry['site']:<25} {entry['username']:<25}", width - 1, attr)
+            screen.addnstr(1, 0, f"Search: {query}", width - 1)
+        except curses.error:
+            pass  # terminal too small; draw what fits
+        screen.refresh()
+
+
     def get_entry_details(self):
         self.clear_screen()
 
@@ -141,4 +274,51 @@ class VaultView:
         """
         print(f"\n[!!!] WARNING: You are about to delete the entry for '{site_name}'.")
         ans = input("Are you sure? This cannot be undone. (y/n): ").lower()
-        return ans == 'y'
\ No newline at end of file
+        return ans == 'y'
+
+
+class ScriptView(VaultView):
+    """
+    View for one-shot commands: no screen clears or pauses,
+    and messages go to stderr so stdout stays machine-readable.
+    """
+
+    @staticmethod
+    def clear_screen():
+        pass
+
+    @staticmethod
+    def pause():
+        pass
+
+    def show_message(self, msg):
+        print(msg, file=sys.stderr)
+
+    def get_master_credentials(self, attempts_left):
+        mp = getpass.getpass("Master Password: ", stream=sys.stderr)
+        sk = getpass.getpass("Secret Key: ", stream=sys.stderr).strip()
+        return mp, sk
+
+    def get_current_credentials(self, title):
+        print(f"--- {title} ---", file=sys.stderr)
+        mp = getpass.getpass("Current Master Password: ", stream=sys.stderr)
+        sk = getpass.getpass("Current Secret Key: ", stream=sys.stderr).strip()
+        return mp, sk
+
+    def get_new_master_password(self):
+        while True:
+            mp = getpass.getpass("New Master Password (min 8 chars): ", stream=sys.stderr)
+            if len(mp) < 8:
+                print("[!] Too weak.", file=sys.stderr)
+                continue
+            if getpass.getpass("Confirm Master Password: ", stream=sys.stderr) != mp:
+                print("[!] Mismatch.", file=sys.stderr)
+                continue
+            return mp
+
+    def confirm_rotate_secret_key(self):
+        print("Also rotate the Secret Key? (y/n): ", end="", file=sys.stderr, flush=True)
+        return input().strip().lower() == 'y'
+
+    def get_password_input(self):
+        return getpass.getpass("Password: ", stream=sys.stderr)
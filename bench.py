@@ -0,0 +1,550 @@
+import os
+import csv
+import sys
+import json
+import time
+import platform
+import random
+import string
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Baseline writes commit (and fsync) per row, so they are sampled, not run in full.
+BASELINE_WRITE_SAMPLE = 2000
+BLOB_SIZE = 120
+LIVE_QUERIES = ("gmail", "github.com", "corp", "a", "zz")
+LIVE_PAGE = 20
+
+# --- SUITE ---
+SUITE_SIZES = [1_000, 10_000, 100_000]
+SUITE_REPEAT = 5
+SUITE_IMPORT_ROWS = 1_000
+SUITE_BUILD_BATCH = 10_000
+SUITE_MP = "bench-master-password"
+REGRESSION_THRESHOLD = 1.25
+
+# --- CONCURRENCY ---
+CONCURRENCY_PROCS = [1, 2, 4, 8]
+CONCURRENCY_ROWS = 200
+CONCURRENCY_SECONDS = 3.0
+CONCURRENCY_WRITES = 0.3    # share of operations that write (edits, plus 1 in 10 adds)
+
+
+def _blobs(n):
+    return (os.urandom(BLOB_SIZE) for _ in range(n))
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds) if seconds else float('inf')
+
+
+def _baseline_storage(db_path, n):
+    """The pre-tuning behaviour: default journal, commit per row, fetchall()."""
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("CREATE TABLE secrets (id INTEGER PRIMARY KEY AUTOINCREMENT, encrypted_data BLOB, "
+                 "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    cur = conn.cursor()
+
+    sample = min(n, BASELINE_WRITE_SAMPLE)
+    start = time.perf_counter()
+    for blob in _blobs(sample):
+        cur.execute("INSERT INTO secrets (encrypted_data) VALUES (?)", (blob,))
+        conn.commit()
+    write = _rate(sample, time.perf_counter() - start)
+
+    # Fill the rest quickly so reads run over the full size.
+    cur.executemany("INSERT INTO secrets (encrypted_data) VALUES (?)", ((b,) for b in _blobs(n - sample)))
+    conn.commit()
+
+    start = time.perf_counter()
+    cur.execute("SELECT id, encrypted_data FROM secrets")
+    rows = len(cur.fetchall())
+    read = _rate(rows, time.perf_counter() - start)
+    conn.close()
+    return write, read
+
+
+def _tuned_storage(db_path, n):
+    """StorageManager as shipped: WAL, pragmas, one transaction, cursor iteration."""
+    from app.storage import StorageManager
+
+    with patch('app.storage.DB_FILE', db_path), patch('app.storage.DATA_DIR', db_path.parent):
+        db = StorageManager()
+        start = time.perf_counter()
+        with db.transaction():
+            for blob in _blobs(n):
+                db.add_secret(blob)
+        write = _rate(n, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rows = sum(1 for _ in db.iter_blobs())
+        read = _rate(rows, time.perf_counter() - start)
+        db.close()
+    return write, read
+
+
+def bench_storage(sizes):
+    results = []
+    print(f"{'ROWS':>8} {'MODE':<9} {'WRITE rows/s':>14} {'READ rows/s':>14}")
+    print("-" * 48)
+    for n in sizes:
+        for mode, runner in (("baseline", _baseline_storage), ("tuned", _tuned_storage)):
+            tmp = Path(tempfile.mkdtemp())
+            try:
+                write, read = runner(tmp / "vault.db", n)
+            finally:
+                shutil.rmtree(tmp)
+            results.append({"rows": n, "mode": mode, "write_rows_per_s": write, "read_rows_per_s": read})
+            print(f"{n:>8} {mode:<9} {write:>14} {read:>14}")
+    return results
+
+
+def _synthetic_entries(n, seed=0):
+    rng = random.Random(seed)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(max(n // 10, 50))]
+    tlds = (".com", ".org", ".net", ".io")
+    domains = ("gmail.com", "corp.example", "outlook.com")
+    return [{
+        'id': i,
+        'site': rng.choice(words) + rng.choice(tlds),
+        'username': f"{rng.choice(words)}@{rng.choice(domains)}",
+        'password': 'x',
+    } for i in range(1, n + 1)]
+
+
+def _percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def bench_live(sizes):
+    """Search-as-you-type: one query per keystroke of each query, served from EntryCache."""
+    from app.cache import EntryCache
+
+    results = []
+    print(f"{'ENTRIES':>8} {'BUILD s':>9} {'p50 ms':>8} {'p95 ms':>8} {'MAX ms':>8}")
+    print("-" * 46)
+    for n in sizes:
+        cache = EntryCache(max_entries=max(n, 1))
+        cache.fill(_synthetic_entries(n))
+
+        start = time.perf_counter()
+        cache.build_search_index()
+        build = time.perf_counter() - start
+
+        samples = []
+        for query in LIVE_QUERIES:
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                cache.search(query[:end], LIVE_PAGE)
+                samples.append((time.perf_counter() - start) * 1000)
+
+        row = {"entries": n, "build_s": round(build, 2), "p50_ms": round(_percentile(samples, 50), 3),
+               "p95_ms": round(_percentile(samples, 95), 3), "max_ms": round(max(samples), 3)}
+        results.append(row)
+        print(f"{n:>8} {row['build_s']:>9} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['max_ms']:>8}")
+    return results
+
+
+def _timed(fn, items):
+    start = time.perf_counter()
+    out = [fn(item) for item in items]
+    return out, time.perf_counter() - start
+
+
+def bench_codec(n):
+    """Record payloads: the old JSON path vs the binary codec, per record."""
+    from app import codec
+
+    records = [(e['site'], e['username'], "p4ssw0rd-" + str(e['id'])) for e in _synthetic_entries(n)]
+    paths = {
+        "json": (lambda r: json.dumps({"site": r[0], "username": r[1], "password": r[2]}).encode('utf-8'),
+                 lambda b: json.loads(b.decode('utf-8'))),
+        "binary": (codec.encode_fields, codec.decode_fields),
+        "binary (site only)": (codec.encode_fields, lambda b: codec.read_field(b, 0)),
+    }
+
+    results = []
+    print(f"{'FORMAT':<20} {'ENCODE us':>10} {'DECODE us':>10} {'BYTES/REC':>10}")
+    print("-" * 54)
+    for name, (encode, decode) in paths.items():
+        blobs, enc = _timed(encode, records)
+        _, dec = _timed(decode, blobs)
+        row = {"format": name, "records": n,
+               "encode_us": round(enc / n * 1e6, 3), "decode_us": round(dec / n * 1e6, 3),
+               "bytes_per_record": round(sum(map(len, blobs)) / n, 1)}
+        results.append(row)
+        print(f"{name:<20} {row['encode_us']:>10} {row['decode_us']:>10} {row['bytes_per_record']:>10}")
+    return results
+
+
+def _vault_size(db):
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.conn.execute("VACUUM")
+    return db.conn.execute("PRAGMA page_count").fetchone()[0] * db.conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def _entry_bytes(db):
+    """Bytes of entry data proper (row blobs + pages), without the blind search index."""
+    return db.conn.execute("""
+        SELECT (SELECT COALESCE(SUM(LENGTH(encrypted_data)), 0) + COALESCE(SUM(LENGTH(encrypted_secret)), 0)
+                FROM secrets)
+             + (SELECT COALESCE(SUM(LENGTH(encrypted_page)), 0) FROM meta_pages)
+    """).fetchone()[0]
+
+
+def _scan(app):
+    """Full metadata scan (cache cold): seconds and AEAD calls."""
+    from app.security import SecurityManager
+
+    app.cache.clear()
+    calls = {"n": 0}
+    decrypt, decrypt_many = SecurityManager.decrypt, SecurityManager.decrypt_many
+
+    def count_one(*args, **kwargs):
+        calls["n"] += 1
+        return decrypt(*args, **kwargs)
+
+    def count_many(rows, *args, **kwargs):
+        for row in decrypt_many(rows, *args, **kwargs):
+            calls["n"] += 1
+            yield row
+
+    with patch.object(SecurityManager, 'decrypt', count_one), patch.object(SecurityManager, 'decrypt_many', count_many):
+        start = time.perf_counter()
+        app._decrypt_all_entries()
+        seconds = time.perf_counter() - start
+    return seconds, calls["n"]
+
+
+def bench_pages(sizes, page_records):
+    """Per-row metadata blobs vs packed pages: file size and full-scan cost."""
+    from app.controller import VaultController
+    from app.security import SecurityManager
+    from app.views import ScriptView
+
+    results = []
+    print(f"{'ENTRIES':>8} {'MODE':<6} {'FILE KiB':>10} {'ENTRY KiB':>10} {'SCAN s':>8} {'AEAD calls':>11}")
+    print("-" * 59)
+    for n in sizes:
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            with patch('app.storage.DB_FILE', tmp / "vault.db"), patch('app.storage.DATA_DIR', tmp):
+                app = VaultController(view=ScriptView())
+                app.key = SecurityManager.generate_data_key()
+                app.index_key = SecurityManager.derive_subkey(app.key, b"search-index")
+                rows = []
+                for e in _synthetic_entries(n):
+                    meta_blob, secret_blob = app._seal_entry(e['site'], e['username'], "p4ssw0rd-" + str(e['id']))
+                    rows.append((meta_blob, secret_blob, app._search_tokens(e['site'], e['username'])))
+                app.db.add_secrets(rows)
+                del rows
+
+                for mode in ("rows", "pages"):
+                    if mode == "pages":
+                        app.pack_vault(page_records)
+                    size, data = _vault_size(app.db), _entry_bytes(app.db)
+                    seconds, calls = _scan(app)
+                    row = {"entries": n, "mode": mode, "file_bytes": size, "entry_bytes": data,
+                           "scan_seconds": round(seconds, 3), "aead_calls": calls}
+                    results.append(row)
+                    print(f"{n:>8} {mode:<6} {size // 1024:>10} {data // 1024:>10} {row['scan_seconds']:>8} {calls:>11}")
+                app.close()
+        finally:
+            shutil.rmtree(tmp)
+    return results
+
+
+def _summary(samples):
+    ms = [s * 1000 for s in samples]
+    return {"runs": len(ms), "p50_ms": round(_percentile(ms, 50), 3),
+            "p95_ms": round(_percentile(ms, 95), 3), "max_ms": round(max(ms), 3)}
+
+
+def _measure(fn, repeat, setup=None):
+    """Times fn() `repeat` times; setup() runs before each call, outside the timing."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def _stub_view():
+    """View with all terminal I/O stubbed: flows pick entry 1, keep values and confirm."""
+    view = MagicMock()
+    view.setup_new_vault.return_value = SUITE_MP
+    view.page_entries.return_value = "1"
+    view.confirm_delete.return_value = True
+    view.get_sort_preference.return_value = "2"
+    view.can_live_search.return_value = False
+    return view
+
+
+def _build_vault(n):
+    """New vault (default KDF params) with n synthetic entries. Returns the Secret Key."""
+    from app.controller import VaultController
+    from app.security import SecurityManager
+
+    with patch.object(SecurityManager, 'calibrate_kdf', return_value=SecurityManager.default_kdf_params()):
+        app = VaultController(view=_stub_view())
+        app.login_flow()
+    secret_key = app.view.show_secret_key.call_args[0][0]
+    app._init_search_index()
+
+    entries = _synthetic_entries(n)
+    for i in range(0, n, SUITE_BUILD_BATCH):
+        rows = []
+        for e in entries[i:i + SUITE_BUILD_BATCH]:
+            meta_blob, secret_blob = app._seal_entry(e['site'], e['username'], "p4ssw0rd-" + str(e['id']))
+            rows.append((meta_blob, secret_blob, app._search_tokens(e['site'], e['username'])))
+        app.db.add_secrets(rows)
+    app.close()
+    return secret_key
+
+
+def _suite_for_size(tmp, n, repeat):
+    from app.controller import VaultController
+    from app.security import SecurityManager
+
+    secret_key = _build_vault(n)
+    env = {"VAULT_MASTER_PASSWORD": SUITE_MP, "VAULT_SECRET_KEY": secret_key}
+    results = {}
+
+    def login():
+        app = VaultController(view=_stub_view())
+        app.script_login()
+        return app
+
+    with patch.dict(os.environ, env), patch('app.agent.request', return_value=None):
+        results["login"] = _measure(lambda: login().close(), repeat)
+        app = login()
+
+    params = SecurityManager.default_kdf_params()
+    salt = SecurityManager.generate_salt()
+    results["derive_key"] = _measure(lambda: SecurityManager.derive_key(SUITE_MP, secret_key, salt, params), repeat)
+    blob = SecurityManager.encrypt(b"x" * 64, app.key)
+    results["encrypt_1k"] = _measure(lambda: [SecurityManager.encrypt(b"x" * 64, app.key) for _ in range(1000)], repeat)
+    results["decrypt_1k"] = _measure(lambda: [SecurityManager.decrypt(blob, app.key) for _ in range(1000)], repeat)
+    results["get_all_blobs"] = _measure(app.db.get_all_blobs, repeat)
+
+    cold = app.cache.clear
+    results["full_decrypt"] = _measure(app._decrypt_all_entries, repeat, setup=cold)
+    results["search_indexed"] = _measure(lambda: app.search("gmail"), repeat, setup=cold)
+    results["search_short"] = _measure(lambda: app.search("a"), repeat, setup=cold)
+    results["sorted_view"] = _measure(lambda: app._sorted_pager('site')(0, LIVE_PAGE), repeat, setup=cold)
+
+    app._decrypt_all_entries()
+    results["add"] = _measure(lambda: app.add_entry("bench.example", "bench", "pw"), repeat)
+    app.view.get_edit_values.return_value = ("edited.example", "bench", False)
+    results["edit"] = _measure(app.edit_entry_flow, repeat)
+    ids = iter(sorted(e['id'] for e in app.list_entries())[-repeat:])
+    results["delete"] = _measure(app.delete_entry_flow, repeat,
+                                 setup=lambda: setattr(app.view.page_entries, 'return_value', str(next(ids))))
+
+    export_csv = tmp / "import.csv"
+    with open(export_csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "login_username", "login_password"])
+        for e in _synthetic_entries(SUITE_IMPORT_ROWS, seed=1):
+            writer.writerow([e['site'], e['username'], "imported"])
+    results[f"import_{SUITE_IMPORT_ROWS}"] = _measure(lambda: app.import_entries(export_csv), repeat)
+    results["export"] = _measure(lambda: app.export_backup(tmp / "vault.pmbk"), repeat)
+
+    app.close()
+    return results
+
+
+def compare_runs(current, baseline_path, threshold):
+    """Prints p50 ratios against a saved run. Returns the regressions (ratio > threshold)."""
+    with open(baseline_path) as f:
+        baseline = {(r["entries"], r["op"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n{'ENTRIES':>8} {'OP':<16} {'BASE p50':>10} {'NOW p50':>10} {'RATIO':>7}")
+    for row in current:
+        base = baseline.get((row["entries"], row["op"]))
+        if not base or not base["p50_ms"]:
+            continue
+        ratio = row["p50_ms"] / base["p50_ms"]
+        flag = "  <-- regression" if ratio > threshold else ""
+        print(f"{row['entries']:>8} {row['op']:<16} {base['p50_ms']:>10} {row['p50_ms']:>10} {ratio:>7.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(row)
+    return regressions
+
+
+def bench_suite(sizes, repeat, out, compare=None, threshold=REGRESSION_THRESHOLD):
+    """
+    End-to-end timings on synthetic vaults built in a temp directory, with view
+    I/O stubbed out. Writes JSON; with --compare, exits 1 on a p50 regression.
+    """
+    rows = []
+    print(f"{'ENTRIES':>8} {'OP':<16} {'p50 ms':>10} {'p95 ms':>10} {'MAX ms':>10}")
+    print("-" * 58)
+    for n in sizes:
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            with patch('app.storage.DB_FILE', tmp / "vault.db"), patch('app.storage.DATA_DIR', tmp):
+                for op, summary in _suite_for_size(tmp, n, repeat).items():
+                    rows.append({"entries": n, "op": op, **summary})
+                    print(f"{n:>8} {op:<16} {summary['p50_ms']:>10} {summary['p95_ms']:>10} {summary['max_ms']:>10}")
+        finally:
+            shutil.rmtree(tmp)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": rows,
+    }
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[+] Results saved to {out}")
+
+    if compare and compare_runs(rows, compare, threshold):
+        sys.exit(1)
+    return report
+
+
+def _concurrency_worker(args):
+    """One process: mixed reads and compare-and-swap edits until the deadline."""
+    from app.storage import StorageManager, ConflictError
+
+    db_path, seed, rows, seconds, write_share, think = args
+    rng = random.Random(seed)
+    stats = {"reads": 0, "edits": 0, "adds": 0, "conflicts": 0, "locked": 0, "write_ms": []}
+    with patch('app.storage.DB_FILE', db_path), patch('app.storage.DATA_DIR', db_path.parent):
+        db = StorageManager()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            row_id = rng.randint(1, rows)
+            try:
+                if rng.random() >= write_share:
+                    db.get_record(row_id)
+                    stats["reads"] += 1
+                    continue
+                start = time.perf_counter()
+                if rng.random() < 0.1:
+                    db.add_secret(os.urandom(BLOB_SIZE), encrypted_secret=os.urandom(BLOB_SIZE))
+                    stats["adds"] += 1
+                else:
+                    _, _, version = db.get_record(row_id)
+                    time.sleep(think)    # the user editing
+                    start = time.perf_counter()
+                    try:
+                        db.update_secret(row_id, os.urandom(BLOB_SIZE), encrypted_secret=os.urandom(BLOB_SIZE),
+                                         expected_version=version)
+                        stats["edits"] += 1
+                    except ConflictError:
+                        stats["conflicts"] += 1
+                stats["write_ms"].append((time.perf_counter() - start) * 1000)
+            except sqlite3.OperationalError:
+                stats["locked"] += 1
+        db.close()
+    return stats
+
+
+def bench_concurrency(procs, rows, seconds, write_share, think_ms):
+    """N processes on one vault file: throughput, CAS conflict rate, lock errors."""
+    import multiprocessing
+    from app.storage import StorageManager
+
+    results = []
+    print(f"{'PROCS':>5} {'OPS/s':>8} {'READS/s':>8} {'WRITES/s':>9} {'CONFLICT %':>11} {'LOCKED':>7} "
+          f"{'WRITE p95 ms':>13}")
+    print("-" * 68)
+    for n in procs:
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            db_path = tmp / "vault.db"
+            with patch('app.storage.DB_FILE', db_path), patch('app.storage.DATA_DIR', tmp):
+                db = StorageManager()
+                db.add_secrets((os.urandom(BLOB_SIZE), os.urandom(BLOB_SIZE), []) for _ in range(rows))
+                db.close()
+
+            jobs = [(db_path, seed, rows, seconds, write_share, think_ms / 1000) for seed in range(n)]
+            with multiprocessing.Pool(n) as pool:
+                stats = pool.map(_concurrency_worker, jobs)
+        finally:
+            shutil.rmtree(tmp)
+
+        total = {k: sum(s[k] for s in stats) for k in ("reads", "edits", "adds", "conflicts", "locked")}
+        write_ms = [ms for s in stats for ms in s["write_ms"]]
+        writes = total["edits"] + total["adds"] + total["conflicts"]
+        row = {
+            "procs": n,
+            "ops_per_s": _rate(total["reads"] + writes, seconds),
+            "reads_per_s": _rate(total["reads"], seconds),
+            "writes_per_s": _rate(writes, seconds),
+            "conflict_pct": round(100 * total["conflicts"] / max(total["edits"] + total["conflicts"], 1), 2),
+            "locked": total["locked"],
+            "write_p95_ms": round(_percentile(write_ms, 95), 2) if write_ms else 0,
+        }
+        results.append(row)
+        print(f"{n:>5} {row['ops_per_s']:>8} {row['reads_per_s']:>8} {row['writes_per_s']:>9} "
+              f"{row['conflict_pct']:>11} {row['locked']:>7} {row['write_p95_ms']:>13}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vault performance benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    storage = sub.add_parser("storage", help="SQLite write/read throughput, baseline vs tuned")
+    storage.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+
+    live = sub.add_parser("live", help="Search-as-you-type keystroke latency")
+    live.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+
+    codec_cmd = sub.add_parser("codec", help="Record encode/decode cost and size, JSON vs binary")
+    codec_cmd.add_argument("--records", type=int, default=100_000)
+
+    pages_cmd = sub.add_parser("pages", help="Vault size and full-scan cost, per-row vs packed pages")
+    pages_cmd.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    pages_cmd.add_argument("--page-records", type=int, default=64)
+
+    suite = sub.add_parser("suite", help="End-to-end timings on synthetic vaults, saved as JSON")
+    suite.add_argument("--sizes", type=int, nargs="+", default=SUITE_SIZES,
+                       help="Vault sizes (e.g. 1000 10000 100000 1000000)")
+    suite.add_argument("--repeat", type=int, default=SUITE_REPEAT)
+    suite.add_argument("--out", default="bench-results.json")
+    suite.add_argument("--compare", help="Earlier results JSON; exit 1 if any p50 regressed")
+    suite.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed p50 ratio")
+
+    concurrency = sub.add_parser("concurrency", help="Several processes on one vault: throughput and conflicts")
+    concurrency.add_argument("--procs", type=int, nargs="+", default=CONCURRENCY_PROCS)
+    concurrency.add_argument("--rows", type=int, default=CONCURRENCY_ROWS, help="Fewer rows, more conflicts")
+    concurrency.add_argument("--seconds", type=float, default=CONCURRENCY_SECONDS)
+    concurrency.add_argument("--writes", type=float, default=CONCURRENCY_WRITES, help="Share of writing operations")
+    concurrency.add_argument("--think-ms", type=float, default=1.0, help="Pause between reading and saving an edit")
+
+    args = parser.parse_args()
+    match args.command:
+        case "storage":
+            bench_storage(args.sizes)
+        case "live":
+            bench_live(args.sizes)
+        case "codec":
+            bench_codec(args.records)
+        case "pages":
+            bench_pages(args.sizes, args.page_records)
+        case "suite":
+            bench_suite(args.sizes, args.repeat, args.out, args.compare, args.threshold)
+        case "concurrency":
+            bench_concurrency(args.procs, args.rows, args.seconds, args.writes, args.think_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,11 @@ ICON_WIN = os.path.join("assets", "app-win.ico")
 ICON_MAC = os.path.join("assets", "app-mac.icns")
 
 
-def build():
+def build(onedir=False):
+    # --onefile unpacks itself to a temp dir on every launch; --onedir starts faster.
     cmd = [
         "uv", "run", "pyinstaller",
-        "--onefile",
+        "--onedir" if onedir else "--onefile",
         "--clean",
         "--name", APP_NAME,
     ]
@@ -59,4 +60,4 @@ def build():
 
 
 if __name__ == "__main__":
-    build()
\ No newline at end of file
+    build(onedir="--onedir" in sys.argv[1:])
\ No newline at end of file
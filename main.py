@@ -1,13 +1,34 @@
-from app.controller import VaultController
+import os
+import sys
+
+from app import metrics
+from app.cli import build_parser, run_agent, run_command, SCRIPT_COMMANDS
 
 def main():
+    args = build_parser().parse_args()
+    if args.metrics or metrics.enabled_by_env():
+        metrics.enable()
     try:
-        app = VaultController()
-        app.run()
+        with metrics.profiled(args.profile or os.environ.get(metrics.PROFILE_ENV)):
+            if args.command == "agent":
+                run_agent(args)
+                return
+            if args.command in SCRIPT_COMMANDS:
+                sys.exit(run_command(args))
+
+            from app.views import VaultView
+            from app import startup
+
+            view = VaultView()
+            preload = startup.Preload()
+            credentials = view.get_master_credentials(3) if startup.prompt_first() else None
+            app = preload.controller(view)
+            app.run(credentials)
     except KeyboardInterrupt:
         print("\n[!] Exiting.")
     except Exception as e:
         print(f"\n[!] Fatal Error: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,14 +1,47 @@
+import io
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import threading
 import unittest
+import multiprocessing
 import shutil
+import contextlib
 import tempfile
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 from app.security import SecurityManager
-from app.storage import StorageManager
+from app.storage import StorageManager, ConflictError
+from app.cache import EntryCache
+from app.search import TrigramIndex
+from app import codec, pages, metrics, breach, audit, agent, startup
+from app.clipboard import ClipboardManager, digest
+from app.agent import KeyAgent
+from app.controller import VaultController
+from app.backup import BackupError
+from app.views import VaultView, ScriptView
 from cryptography.exceptions import InvalidTag
 
 
+def _cas_worker(rounds):
+    """Read-modify-write of row 1 from another process, retrying on conflict."""
+    db = StorageManager()
+    conflicts = done = 0
+    while done < rounds:
+        _, _, version = db.get_record(1)
+        try:
+            db.update_secret(1, b"v%d" % version, expected_version=version)
+            done += 1
+        except ConflictError:
+            conflicts += 1
+    db.close()
+    return conflicts
+
+
 class TestSecurity(unittest.TestCase):
     """
     Tests for the cryptographic functions.
@@ -60,6 +93,22 @@ class TestSecurity(unittest.TestCase):
         with self.assertRaises(InvalidTag):
             SecurityManager.decrypt(bytes(encrypted_blob), self.key)
 
+    def test_batch_cycle(self):
+        """Test that batch encrypt/decrypt keeps order and reports bad rows."""
+        payloads = [f"entry-{i}".encode() for i in range(600)]
+        blobs = list(SecurityManager.encrypt_many(payloads, self.key, workers=4))
+        rows = list(enumerate(blobs))
+        rows[5] = (5, b"short")
+
+        results = list(SecurityManager.decrypt_many(rows, self.key, workers=4))
+
+        self.assertEqual([r[0] for r in results], list(range(600)))
+        self.assertIsInstance(results[5][2], ValueError)
+        for row_id, plaintext, error in results:
+            if row_id != 5:
+                self.assertIsNone(error)
+                self.assertEqual(plaintext, payloads[row_id])
+
     def test_b64_helpers(self):
         """Test Base64 encoding/decoding helpers."""
         original = b"\x00\xFF\x10"
@@ -68,6 +117,72 @@ class TestSecurity(unittest.TestCase):
         self.assertEqual(original, decoded)
         self.assertIsInstance(encoded, str)
 
+    def test_kdf_params(self):
+        """Test that KDF parameters change the key and calibration respects its bounds."""
+        params = {"memory_cost": 8192, "time_cost": 1, "parallelism": 1}
+        self.assertNotEqual(self.key, SecurityManager.derive_key(self.mp, self.sk, self.salt, params))
+
+        calibrated = SecurityManager.calibrate_kdf(target_seconds=0.01)
+        self.assertEqual(calibrated["memory_cost"], 65536)
+        self.assertEqual(calibrated["time_cost"], 2)
+        self.assertGreaterEqual(calibrated["parallelism"], 1)
+
+    def test_blind_tokens(self):
+        """Test that tokens are deterministic per key and differ across keys."""
+        index_key = SecurityManager.derive_subkey(self.key, b"search-index")
+        self.assertNotEqual(index_key, self.key)
+
+        token = SecurityManager.blind_token(index_key, "goo")
+        self.assertEqual(token, SecurityManager.blind_token(index_key, "goo"))
+        self.assertNotEqual(token, SecurityManager.blind_token(index_key, "oog"))
+
+        other_key = SecurityManager.derive_subkey(self.key, b"other")
+        self.assertNotEqual(token, SecurityManager.blind_token(other_key, "goo"))
+
+
+class TestCodec(unittest.TestCase):
+    """
+    Tests the binary record format and its JSON fallback.
+    """
+
+    def test_roundtrip(self):
+        """Test empty, non-ASCII and long (multi-byte length) fields."""
+        values = ["", "bücher.de", "x" * 300]
+        blob = codec.encode_fields(values)
+        self.assertEqual(codec.decode_fields(blob), values)
+        self.assertEqual(codec.read_field(blob, 2), "x" * 300)
+        self.assertLess(len(codec.encode_meta("github.com", "bob")),
+                        len(b'{"site": "github.com", "username": "bob"}'))
+
+    def test_lazy_fields_and_json_fallback(self):
+        """Test that single fields decode alone and legacy JSON payloads still read."""
+        blob = codec.encode_meta("github.com", "bob")
+        self.assertEqual(codec.decode_meta(blob), {"site": "github.com", "username": "bob"})
+        self.assertEqual(codec.meta_field(blob, "username"), "bob")
+
+        legacy = b'{"site": "old.com", "username": "carol", "password": "pw"}'
+        self.assertEqual(codec.decode_meta(legacy)["password"], "pw")
+        self.assertEqual(codec.meta_field(legacy, "site"), "old.com")
+
+    def test_page_roundtrip(self):
+        """Test that a page packs, compresses and finds single entries."""
+        entries = [{'id': i, 'site': f"site{i}.com", 'username': f"user{i}@gmail.com"} for i in range(1, 65)]
+        plain = pages.pack(entries)
+        self.assertEqual(pages.unpack(plain), entries)
+        self.assertEqual(pages.find(plain, 40)['site'], "site40.com")
+        self.assertIsNone(pages.find(plain, 99))
+        self.assertLess(len(plain), sum(len(codec.encode_meta(e['site'], e['username'])) for e in entries))
+
+    def test_rejects_bad_records(self):
+        """Test truncated records and unknown versions."""
+        blob = codec.encode_meta("github.com", "bob")
+        with self.assertRaises(codec.CodecError):
+            codec.decode_fields(blob[:-1])
+        with self.assertRaises(codec.CodecError):
+            codec.read_field(blob[:4], 1)
+        with self.assertRaises(codec.CodecError):
+            codec.decode_meta(b"\x09" + blob[1:])
+
 
 class TestStorage(unittest.TestCase):
     """
@@ -133,6 +248,849 @@ class TestStorage(unittest.TestCase):
         rows = self.db.get_all_blobs()
         self.assertEqual(len(rows), 0)
 
+    def test_compare_and_swap(self):
+        """Test that a versioned update fails if the row changed since it was read."""
+        row_id = self.db.add_secret(b"a", encrypted_secret=b"s")
+        self.assertEqual(self.db.get_record(row_id), (b"a", b"s", 1))
+
+        self.assertTrue(self.db.update_secret(row_id, b"b", encrypted_secret=b"s", expected_version=1))
+        with self.assertRaises(ConflictError):
+            self.db.update_secret(row_id, b"c", encrypted_secret=b"s", expected_version=1)
+        self.assertEqual(self.db.get_record(row_id), (b"b", b"s", 2))
+        self.assertFalse(self.db.update_secret(99, b"x", expected_version=1))
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_concurrent_writers(self):
+        """Test that writers in several processes neither lose updates nor hit 'database is locked'."""
+        self.db.add_secret(b"v1")
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            pool.map(_cas_worker, [25] * 4)
+        self.assertEqual(self.db.get_version(1), 101)
+
+    def test_add_returns_id(self):
+        """Test that add_secret returns the new row ID and has_secrets tracks it."""
+        self.assertFalse(self.db.has_secrets())
+        new_id = self.db.add_secret(b"blob")
+        self.assertTrue(self.db.has_secrets())
+        self.assertEqual(self.db.get_all_blobs()[0][0], new_id)
+
+    def test_tuning_and_transactions(self):
+        """Test WAL mode, nested transactions committing once, and rollback on error."""
+        mode = self.db.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode.lower(), "wal")
+
+        with self.db.transaction():
+            self.db.add_secret(b"a")
+            with self.db.transaction():
+                self.db.add_secret(b"b")
+            self.assertTrue(self.db.conn.in_transaction)
+        self.assertFalse(self.db.conn.in_transaction)
+
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.add_secret(b"c")
+                raise RuntimeError("boom")
+
+        self.assertEqual([blob for _, blob in self.db.iter_blobs()], [b"a", b"b"])
+
+    def test_fetch_by_id(self):
+        """Test single and batched primary-key reads, including missing IDs."""
+        ids = [self.db.add_secret(f"blob{i}".encode()) for i in range(3)]
+        self.assertEqual(self.db.get_blob(ids[1]), (ids[1], b"blob1"))
+        self.assertIsNone(self.db.get_blob(999))
+        with patch('app.storage.MAX_SQL_VARIABLES', 2):
+            rows = self.db.get_blobs([ids[2], ids[0], ids[2], 999, ids[1]])
+        self.assertEqual(rows, [(ids[0], b"blob0"), (ids[1], b"blob1"), (ids[2], b"blob2")])
+
+    def test_search_index(self):
+        """Test that search_blobs returns rows carrying all tokens and deletes clean up."""
+        id_a = self.db.add_secret(b"a", [b"t1", b"t2"])
+        id_b = self.db.add_secret(b"b", [b"t2", b"t3"])
+
+        self.assertEqual(self.db.search_blobs([b"t2"]), [(id_a, b"a"), (id_b, b"b")])
+        self.assertEqual(self.db.search_blobs([b"t1", b"t2"]), [(id_a, b"a")])
+        self.assertEqual(self.db.search_blobs([b"t1", b"t3"]), [])
+
+        self.db.update_secret(id_a, b"a2", [b"t3"])
+        self.assertEqual(self.db.search_blobs([b"t3"]), [(id_a, b"a2"), (id_b, b"b")])
+
+        self.db.delete_secret(id_b)
+        self.assertEqual(self.db.search_blobs([b"t3"]), [(id_a, b"a2")])
+
+
+class TestEntryCache(unittest.TestCase):
+    """
+    Tests the session cache of decrypted entries.
+    """
+
+    def setUp(self):
+        self.entries = [
+            {'id': 1, 'site': 'a.com', 'username': 'alice', 'password': 'x'},
+            {'id': 2, 'site': 'b.com', 'username': 'bob', 'password': 'y'},
+        ]
+
+    def test_fill_and_write_through(self):
+        """Test that add/edit/delete update the cache in place."""
+        cache = EntryCache()
+        cache.fill(self.entries)
+        self.assertTrue(cache.is_fresh())
+
+        cache.put({'id': 3, 'site': 'c.com', 'username': 'carol', 'password': 'z'})
+        cache.put({'id': 1, 'site': 'a.org', 'username': 'alice', 'password': 'x'})
+        cache.remove(2)
+
+        sites = sorted(e['site'] for e in cache.entries())
+        self.assertEqual(sites, ['a.org', 'c.com'])
+
+    def test_sorted_pages(self):
+        """Test that sorted orderings follow add/edit/delete without a re-sort."""
+        cache = EntryCache()
+        cache.fill(self.entries)
+        cache.put({'id': 3, 'site': 'A-first.com', 'username': 'zed', 'password': 'z'})
+        cache.put({'id': 1, 'site': 'z.com', 'username': 'alice', 'password': 'x'})
+        cache.remove(2)
+
+        self.assertEqual([e['id'] for e in cache.page('site', 0, 10)], [3, 1])
+        self.assertEqual([e['id'] for e in cache.page('username', 0, 10)], [1, 3])
+        self.assertEqual([e['id'] for e in cache.page('id', 1, 1)], [3])
+
+    def test_returns_copies(self):
+        """Test that scrubbing a returned entry does not corrupt the cache."""
+        cache = EntryCache()
+        cache.fill(self.entries)
+        entry = cache.entries()[0]
+        del entry['password']
+        self.assertIn('password', cache.get(entry['id']))
+
+    def test_size_and_time_limits(self):
+        """Test that oversized vaults are not cached and stale caches expire."""
+        small = EntryCache(max_entries=1)
+        small.fill(self.entries)
+        self.assertFalse(small.is_fresh())
+
+        expiring = EntryCache(ttl=0)
+        expiring.fill(self.entries)
+        with patch('app.cache.time.monotonic', return_value=expiring._loaded_at + 1):
+            self.assertFalse(expiring.is_fresh())
+        self.assertTrue(expiring.is_empty())
+
+    def test_live_search_follows_writes(self):
+        """Test that the live-search index tracks add/edit/delete."""
+        cache = EntryCache()
+        cache.fill(self.entries)
+        self.assertEqual([e['id'] for e in cache.search("b.c", 10)[0]], [2])
+
+        cache.put({'id': 2, 'site': 'zz.com', 'username': 'bob', 'password': 'y'})
+        cache.put({'id': 3, 'site': 'b.com', 'username': 'carol', 'password': 'z'})
+        self.assertEqual([e['id'] for e in cache.search("b.c", 10)[0]], [3])
+        cache.remove(3)
+        self.assertEqual(cache.search("b.c", 10), ([], False))
+
+
+class TestTrigramIndex(unittest.TestCase):
+    """
+    Tests ranking and maintenance of the search-as-you-type index.
+    """
+
+    def setUp(self):
+        self.index = TrigramIndex()
+        self.index.build([
+            {'id': 1, 'site': 'mygithub.io', 'username': 'x'},
+            {'id': 2, 'site': 'github.com', 'username': 'alice'},
+            {'id': 3, 'site': 'mail.com', 'username': 'github-bot'},
+            {'id': 4, 'site': 'git.io', 'username': 'bob'},
+            {'id': 5, 'site': 'example.org', 'username': 'me@github.com'},
+        ])
+
+    def test_ranking(self):
+        """Test that site prefixes beat username prefixes, which beat substrings."""
+        ids, more = self.index.query("GitHub")
+        self.assertEqual(ids, [2, 3, 1, 5])
+        self.assertFalse(more)
+
+    def test_short_queries_and_limit(self):
+        """Test one- and two-letter queries and the `more` flag."""
+        self.assertEqual(self.index.query("g", limit=2), ([4, 2], True))
+        self.assertEqual(self.index.query("io")[0], [4, 1])
+        self.assertEqual(self.index.query("zz"), ([], False))
+        self.assertEqual(self.index.query("  "), ([], False))
+
+    def test_add_and_remove(self):
+        """Test that edits re-rank and deleted entries disappear."""
+        self.index.add({'id': 1, 'site': 'gitea.dev', 'username': 'x'})
+        self.index.remove(2)
+        self.assertEqual(self.index.query("git")[0], [4, 1, 3, 5])
+        self.assertEqual(self.index.query("mygit"), ([], False))
+
+
+class TestKeyAgent(unittest.TestCase):
+    """
+    Tests the agent's key bookkeeping (no socket needed).
+    """
+
+    def setUp(self):
+        self.agent = KeyAgent("unused.sock", ttl=100, idle=10)
+        self.key = SecurityManager.encode_b64(b"k" * 32)
+
+    def test_put_get_lock(self):
+        """Test that a stored key is returned until the agent is locked."""
+        self.agent.handle({"op": "put", "vault": "v1", "key": self.key})
+        self.assertEqual(self.agent.handle({"op": "get", "vault": "v1"})["key"], self.key)
+        self.assertFalse(self.agent.handle({"op": "get", "vault": "v2"})["ok"])
+
+        self.agent.handle({"op": "lock"})
+        self.assertFalse(self.agent.handle({"op": "get", "vault": "v1"})["ok"])
+
+    def test_idle_and_ttl_expiry(self):
+        """Test that keys expire after the idle timeout and the hard TTL."""
+        with patch('app.agent.time.monotonic', return_value=1000):
+            self.agent.handle({"op": "put", "vault": "v1", "key": self.key})
+        with patch('app.agent.time.monotonic', return_value=1009):
+            self.assertTrue(self.agent.handle({"op": "get", "vault": "v1"})["ok"])
+        with patch('app.agent.time.monotonic', return_value=1020):
+            self.assertFalse(self.agent.handle({"op": "get", "vault": "v1"})["ok"])
+
+        with patch('app.agent.time.monotonic', return_value=2000):
+            self.agent.handle({"op": "put", "vault": "v1", "key": self.key, "ttl": 5})
+        with patch('app.agent.time.monotonic', return_value=2006):
+            self.assertFalse(self.agent.handle({"op": "get", "vault": "v1"})["ok"])
+
+    @unittest.skipUnless(agent.is_supported(), "needs Unix domain sockets")
+    def test_socket_trust(self):
+        """Test that keys only reach an agent in a private directory, and that serve refuses a shared one."""
+        test_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, test_dir)
+        shared = test_dir / "shared"
+        shared.mkdir()
+        os.chmod(shared, 0o777)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(str(shared / "agent.sock"))
+        listener.listen(1)
+        listener.settimeout(0.2)
+
+        with patch.dict(os.environ, VAULT_AGENT_SOCK=str(shared / "agent.sock")):
+            self.assertFalse(agent.store_key("v1", b"k" * 32))
+            self.assertRaises(socket.timeout, listener.accept)    # nothing was sent
+            self.assertRaises(SystemExit, KeyAgent(shared / "agent.sock")._bind)
+
+        private = test_dir / "private" / "agent.sock"
+        server = threading.Thread(target=KeyAgent(private).serve, daemon=True)
+        with patch.dict(os.environ, VAULT_AGENT_SOCK=str(private)):
+            server.start()
+            for _ in range(50):
+                if agent.is_running():
+                    break
+                time.sleep(0.05)
+            self.assertTrue(agent.store_key("v1", b"k" * 32))
+            self.assertEqual(agent.fetch_key("v1"), b"k" * 32)
+            agent.request({"op": "stop"})
+        server.join(5)
+
+
+class TestController(unittest.TestCase):
+    """
+    Tests controller logic against a temporary vault, with the view mocked out.
+    """
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch('app.storage.DB_FILE', Path(self.test_dir) / "vault.db"),
+            patch('app.agent.request', return_value=None),
+            patch('app.security.SecurityManager.calibrate_kdf',
+                  return_value=SecurityManager.default_kdf_params()),
+        ]
+        for p in self.patchers:
+            p.start()
+
+        self.app = VaultController(view=MagicMock())
+        self.app.view.setup_new_vault.return_value = "password123"
+        self.app.login_flow()
+        self.app._init_search_index()
+
+        for site, user in (("google.com", "alice"), ("github.com", "bob"), ("gitlab.com", "alice")):
+            self.app.add_entry(site, user, f"pw-{site}")
+
+    def tearDown(self):
+        self.app.close()
+        for p in self.patchers:
+            p.stop()
+        shutil.rmtree(self.test_dir)
+
+    def test_search(self):
+        """Test indexed and short (full-scan) queries return the same matches."""
+        self.assertEqual([e['site'] for e in self.app.search("git")], ["github.com", "gitlab.com"])
+        self.assertEqual([e['site'] for e in self.app.search("alice")], ["google.com", "gitlab.com"])
+        self.assertEqual(len(self.app.search("g")), 3)
+        self.assertEqual(self.app.search("nothing"), [])
+
+    def test_resolve_entry(self):
+        """Test lookup by ID and by exact site, including misses."""
+        self.assertEqual(self.app.resolve_entry("2")['site'], "github.com")
+        self.assertEqual(self.app.resolve_entry("GitLab.com")['password'], "pw-gitlab.com")
+        with self.assertRaises(LookupError):
+            self.app.resolve_entry("git")
+        with self.assertRaises(LookupError):
+            self.app.resolve_entry("99")
+
+    def test_get_entry_skips_full_decrypt(self):
+        """Test that an ID lookup reads one row, with or without the cache."""
+        self.app.cache.clear()
+        with patch.object(self.app.db, 'iter_blobs', side_effect=AssertionError("full scan")):
+            self.assertEqual(self.app.get_entry("2")['password'], "pw-github.com")
+            self.assertNotIn('password', self.app.get_entry("2", with_password=False))
+            self.assertIsNone(self.app.get_entry("99"))
+            self.assertIsNone(self.app.get_entry("abc"))
+            self.assertEqual(self.app.resolve_entry("3")['password'], "pw-gitlab.com")
+
+    def test_split_record_layout(self):
+        """Test that listings carry no passwords and secrets can't be swapped between rows."""
+        self.app.cache.clear()
+        self.assertTrue(all('password' not in e for e in self.app.list_entries()))
+        self.assertTrue(all('password' not in e for e in self.app.search("git")))
+
+        conn = self.app.db.conn
+        (secret_1,), (secret_2,) = conn.execute("SELECT encrypted_secret FROM secrets WHERE id IN (1, 2) ORDER BY id")
+        conn.execute("UPDATE secrets SET encrypted_secret = ? WHERE id = 1", (secret_2,))
+        self.assertIsNone(self.app.get_entry(1))
+
+    def test_legacy_rows_are_migrated(self):
+        """Test that single-blob rows are re-sealed as metadata + password on unlock."""
+        legacy = b'{"site": "old.com", "username": "carol", "password": "pw-old"}'
+        legacy_id = self.app.db.add_secret(SecurityManager.encrypt(legacy, self.app.key))
+        self.assertEqual(self.app.db.legacy_ids(), [legacy_id])
+
+        self.app._migrate_split_fields()
+
+        self.assertEqual(self.app.db.legacy_ids(), [])
+        self.assertEqual(self.app.get_entry(legacy_id)['password'], "pw-old")
+        self.assertNotIn('password', self.app.get_entry(legacy_id, with_password=False))
+
+    def test_edit_conflict(self):
+        """Test that an edit racing another session's write is refused, not lost."""
+        def concurrent_write(site, username):
+            self.app.db.update_secret(2, b"other-session", encrypted_secret=b"x")
+            return site, "bob2", False
+
+        self.app.view.get_edit_values.side_effect = concurrent_write
+        with patch.object(self.app, '_pick_entry', return_value="2"):
+            self.app.edit_entry_flow()
+
+        self.assertIn("changed by another session", self.app.view.show_message.call_args[0][0])
+        self.assertEqual(self.app.db.get_record(2)[0], b"other-session")
+
+    def _entries(self, app):
+        app.cache.clear()
+        return sorted((e['site'], e['username'], app.get_entry(e['id'])['password']) for e in app.list_entries())
+
+    def test_sync(self):
+        """Test seeding a copy, then a two-way delta sync with a conflict and a delete."""
+        peer_dir = Path(self.test_dir) / "peer"
+        self.assertEqual(self.app.sync_vault(peer_dir)["pushed"], 3)
+
+        with patch('app.storage.DB_FILE', peer_dir / "vault.db"):
+            other = VaultController(view=MagicMock())
+        other.key = self.app.key
+        other._init_search_index()
+        self.assertEqual(self._entries(other), self._entries(self.app))
+
+        self.app.db.delete_secret(1)
+        other.add_entry("new.org", "dave", "pw-new")
+        for app, pwd in ((self.app, "pw-local"), (other, "pw-peer")):
+            meta_blob, secret_blob = app._seal_entry("github.com", "bob", pwd)
+            app.db.update_secret(2, meta_blob, encrypted_secret=secret_blob)
+
+        report = self.app.sync_vault(peer_dir)
+        self.assertEqual((report["examined"], report["conflicts"]), (3, 1))
+        self.assertEqual(self._entries(other), self._entries(self.app))
+        self.assertEqual([e[0] for e in self._entries(self.app)], ["github.com", "gitlab.com", "new.org"])
+        self.assertEqual([e['site'] for e in other.search("new")], ["new.org"])
+        self.assertEqual(self.app.sync_vault(peer_dir)["examined"], 0)
+        other.close()
+
+    def test_sync_refuses_other_vault(self):
+        """Test that a vault under a different key is never merged into (also: a file target without a suffix)."""
+        stranger = Path(self.test_dir) / "strangervault"
+        with patch('app.storage.DB_FILE', stranger):
+            other = VaultController(view=MagicMock())
+            other.view.setup_new_vault.return_value = "other-password"
+            other.login_flow()
+            other._init_search_index()
+            other.add_entry("x.com", "x", "pw-x")
+            other.close()
+
+        with self.assertRaises(ValueError):
+            self.app.sync_vault(stranger)
+
+    def test_sorted_view_over_cache_limit(self):
+        """Test that a vault too big to cache is scanned once per sorted view."""
+        self.app.cache = EntryCache(max_entries=2)
+        with patch.object(self.app.db, 'iter_blobs', wraps=self.app.db.iter_blobs) as scans:
+            page = self.app._sorted_pager('site')(0, 10)
+        self.assertEqual([e['site'] for e in page], ["github.com", "gitlab.com", "google.com"])
+        self.assertEqual(scans.call_count, 1)
+
+    def test_audit_breaches(self):
+        """Test that compromised entries are reported by ID, without their passwords."""
+        source = Path(self.test_dir) / "pwned.txt"
+        source.write_text(f"{breach.sha1(b'pw-github.com').hex().upper()}:42\n")
+        corpus = Path(self.test_dir) / "breach.bin"
+        breach.build(source, corpus)
+
+        report = self.app.audit_breaches(corpus)
+        self.assertEqual(report["checked"], 3)
+        self.assertEqual(report["compromised"], [{"id": 2, "site": "github.com", "username": "bob", "seen": 42}])
+
+    def test_audit_vault(self):
+        """Test reuse, near-duplicate and weakness findings, and that repeat runs only process changed entries."""
+        self.app.add_entry("gmail.com", "alice", "pw-google.com")
+        self.app.add_entry("shop.com", "alice", "Summer2023!")
+        self.app.add_entry("bank.com", "alice", "$ummer24")
+        self.app.add_entry("strong.com", "alice", "q8#Vx2!mZr7@Lk4pW9s")
+
+        report = self.app.audit_vault()
+        self.assertEqual((report["checked"], report["processed"]), (7, 7))
+        self.assertEqual(report["reused"], [[1, 4]])
+        self.assertEqual(report["similar"], [[5, 6]])
+        self.assertEqual([w["id"] for w in report["weak"]], [6])
+        self.assertEqual(report["weak"][0]["site"], "bank.com")
+        self.assertNotIn("pw-google.com", json.dumps(report))
+
+        self.assertEqual(self.app.audit_vault()["processed"], 0)
+
+        meta_blob, secret_blob = self.app._seal_entry("gmail.com", "alice", "a-fresh-Passphrase-91")
+        self.app.db.update_secret(4, meta_blob, encrypted_secret=secret_blob)
+        self.app.db.delete_secret(6)
+        report = self.app.audit_vault()
+        self.assertEqual((report["checked"], report["processed"]), (6, 1))
+        self.assertEqual((report["reused"], report["similar"], report["weak"]), ([], [], []))
+
+    def test_password_strength(self):
+        """Test the entropy estimate, charset classes and skeletons used for near-duplicates."""
+        self.assertLess(audit.entropy_bits("aaaaaaaaaaaa"), audit.WEAK_BITS)
+        self.assertLess(audit.entropy_bits("abcdefghijkl"), audit.entropy_bits("axbwcvduetfs"))
+        self.assertEqual(audit.class_names(audit._class_mask("aB3!é")), ["lower", "upper", "digit", "symbol", "other"])
+        self.assertEqual(audit.skeleton("P@ssw0rd1!"), "password")
+        self.assertEqual(audit.skeleton("Summer2023"), audit.skeleton("summer"))
+        self.assertEqual(audit.skeleton("abc123"), "")
+
+    def test_import(self):
+        """Test CSV import maps common headers, skips bad rows and indexes new entries."""
+        export = Path(self.test_dir) / "export.csv"
+        export.write_text(
+            "name,url,username,password\n"
+            "Example,https://example.com,eve, secret1 \n"
+            ",https://www.nopass.org/login,joe,\n"
+            ",https://www.host-only.net/login,joe,secret2\n"
+        )
+
+        report = self.app.import_entries(export, batch_size=1)
+
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(report['skipped'], [(3, "missing password")])
+        self.assertEqual(self.app.resolve_entry("Example")['password'], " secret1 ")
+        self.assertEqual(self.app.resolve_entry("www.host-only.net")['username'], "joe")
+
+    def test_backup_roundtrip(self):
+        """Test export -> restore into an empty vault, and that tampering is detected."""
+        backup_file = Path(self.test_dir) / "vault.pmbk"
+        report = self.app.export_backup(backup_file)
+        self.assertGreater(report['records'], 3)
+
+        secret_key = self.app.view.show_secret_key.call_args[0][0]
+        creds = {"VAULT_MASTER_PASSWORD": "password123", "VAULT_SECRET_KEY": secret_key}
+
+        with patch('app.storage.DB_FILE', Path(self.test_dir) / "restored.db"), \
+                patch.dict('os.environ', creds):
+            restored = VaultController(view=MagicMock())
+            restored.restore_backup(backup_file)
+            self.assertEqual(restored.resolve_entry("github.com")['password'], "pw-github.com")
+            self.assertEqual(len(restored.search("git")), 2)
+
+            with self.assertRaises(BackupError):
+                restored.restore_backup(backup_file)
+            restored.close()
+
+        data = backup_file.read_bytes()
+        backup_file.write_bytes(data[:-1] + bytes([data[-1] ^ 1]))
+        with patch('app.storage.DB_FILE', Path(self.test_dir) / "tampered.db"), \
+                patch.dict('os.environ', creds):
+            tampered = VaultController(view=MagicMock())
+            with self.assertRaises(BackupError):
+                tampered.restore_backup(backup_file)
+            self.assertFalse(tampered.db.get_config("salt"))
+            tampered.close()
+
+    def test_backup_failure_leaves_no_partial(self):
+        """Test that an export failing midway removes its temporary file."""
+        backup_file = Path(self.test_dir) / "vault.pmbk"
+        with patch('app.backup.BackupWriter.write', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.app.export_backup(backup_file)
+        self.assertEqual(list(Path(self.test_dir).glob("vault.pmbk*")), [])
+
+    def test_retune_kdf(self):
+        """Test that re-tuning stores new KDF parameters and keeps the vault readable."""
+        secret_key = self.app.view.show_secret_key.call_args[0][0]
+        tuned = {"memory_cost": 65536, "time_cost": 2, "parallelism": 1}
+        self.app.view.get_current_credentials.return_value = ("password123", secret_key)
+
+        with patch('app.security.SecurityManager.calibrate_kdf', return_value=tuned):
+            self.assertTrue(self.app.retune_kdf_flow())
+        self.assertEqual(self.app._kdf_params(), tuned)
+
+        salt, validation, _ = self.app._load_vault_params()
+        kek = self.app._check_credentials("password123", secret_key, salt, validation)
+        self.assertEqual(self.app._unwrap_data_key(kek), self.app.key)
+
+    def test_change_master_password(self):
+        """Test that a password change re-wraps the data key without touching entries."""
+        secret_key = self.app.view.show_secret_key.call_args[0][0]
+        blobs_before = self.app.db.get_all_blobs()
+        old_salt = self.app._load_vault_params()[0]
+
+        self.app.view.get_current_credentials.return_value = ("password123", secret_key)
+        self.app.view.get_new_master_password.return_value = "brand-new-pass"
+        self.app.view.confirm_rotate_secret_key.return_value = False
+        self.app.change_master_password_flow()
+
+        self.assertEqual(self.app.db.get_all_blobs(), blobs_before)
+        new_salt, new_validation, _ = self.app._load_vault_params()
+        self.assertNotEqual(new_salt, old_salt)
+        self.assertIsNone(self.app._check_credentials("password123", secret_key, new_salt, new_validation))
+
+        creds = {"VAULT_MASTER_PASSWORD": "brand-new-pass", "VAULT_SECRET_KEY": secret_key}
+        with patch.dict('os.environ', creds):
+            other = VaultController(view=MagicMock())
+            other.script_login()
+            self.assertEqual(other.resolve_entry("google.com")['password'], "pw-google.com")
+            other.close()
+
+    def test_legacy_vault_migration(self):
+        """Test that a vault whose entries use the KEK directly is wrapped on first unlock."""
+        db = self.app.db
+        salt = SecurityManager.generate_salt()
+        kek = SecurityManager.derive_key("legacy-pass", "legacy-sk", salt)
+        db.save_config("salt", SecurityManager.encode_b64(salt))
+        db.save_config("validation", SecurityManager.encode_b64(SecurityManager.encrypt(b"VALID", kek)))
+        db.conn.execute("DELETE FROM config WHERE key IN ('wrapped_key', 'kdf_params')")
+        db.conn.commit()
+
+        self.assertTrue(self.app._try_unlock("legacy-pass", "legacy-sk", salt,
+                                             SecurityManager.encrypt(b"VALID", kek), "vid"))
+        self.assertEqual(self.app.key, kek)
+        wrapped = SecurityManager.decode_b64(db.get_config("wrapped_key"))
+        self.assertEqual(SecurityManager.unwrap_key(wrapped, kek), kek)
+
+    def test_paged_listing(self):
+        """Test that a page only decrypts its own rows and a picked ID needs no lookup."""
+        self.app.cache.clear()
+        with patch('app.controller.SecurityManager.decrypt_many',
+                   wraps=SecurityManager.decrypt_many) as decrypt_many:
+            page = self.app._fetch_page(1, 1)
+            rows = list(decrypt_many.call_args[0][0])
+        self.assertEqual([e['site'] for e in page], ["github.com"])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(self.app._lookup_entry("2")['password'], "pw-github.com")
+
+    def test_packed_mode(self):
+        """Test pack, reads/writes on packed entries, and unpack back to rows."""
+        report = self.app.pack_vault(page_records=2)
+        self.assertEqual((report['packed'], report['pages']), (3, 2))
+        self.assertEqual(self.app.db.loose_ids(), [])
+
+        self.app.cache.clear()
+        self.assertEqual(self.app.get_entry(3)['password'], "pw-gitlab.com")
+        self.assertEqual([e['site'] for e in self.app.search("git")], ["github.com", "gitlab.com"])
+
+        new_id, _ = self.app.add_entry("new.com", "dave", "pw-new")
+        self.assertEqual(self.app.db.loose_ids(), [])
+        self.assertEqual(self.app.db.tail_page()[1], 2)
+
+        self.app.view.page_entries.return_value = "2"
+        self.app.view.confirm_delete.return_value = True
+        self.app.delete_entry_flow()
+        self.assertEqual(sorted(e['id'] for e in self.app.list_entries()), [1, 3, new_id])
+
+        # Pages are bound to their number: a swapped page fails authentication.
+        conn = self.app.db.conn
+        conn.execute("UPDATE meta_pages SET page_no = 9 WHERE page_no = 1")
+        conn.execute("UPDATE secrets SET page_no = 9 WHERE page_no = 1")
+        self.assertIsNone(self.app.get_entry(1))
+        conn.execute("UPDATE meta_pages SET page_no = 1 WHERE page_no = 9")
+        conn.execute("UPDATE secrets SET page_no = 1 WHERE page_no = 9")
+
+        self.assertEqual(self.app.unpack_vault()['unpacked'], 3)
+        self.assertEqual(list(self.app.db.iter_pages()), [])
+        self.assertEqual(self.app.get_entry(new_id)['password'], "pw-new")
+
+
+class TestPager(unittest.TestCase):
+    """
+    Tests paging navigation in the view.
+    """
+
+    def setUp(self):
+        self.view = VaultView()
+        self.view.list_entries = MagicMock()
+        self.requests = []
+
+    def fetch(self, offset, limit):
+        self.requests.append(offset)
+        return []
+
+    def test_navigation_and_pick(self):
+        """Test next/prev/jump stay in range and an ID is returned in picker mode."""
+        with patch('builtins.input', side_effect=["n", "n", "p", "j 9", "n", "42"]), \
+                patch('builtins.print'):
+            picked = self.view.page_entries(self.fetch, total=45, prompt="Enter ID")
+        self.assertEqual(picked, "42")
+        self.assertEqual(self.requests, [0, 20, 40, 20, 40, 40])
+
+    def test_browse_ignores_ids(self):
+        """Test that browse mode only returns on Enter."""
+        with patch('builtins.input', side_effect=["42", ""]), patch('builtins.print'):
+            self.assertEqual(self.view.page_entries(self.fetch, total=5), '')
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Tests the per-phase timing spans.
+    """
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = Path(self.test_dir) / "metrics.jsonl"
+        metrics.enable(self.path)
+
+    def tearDown(self):
+        metrics.disable()
+        shutil.rmtree(self.test_dir)
+
+    def records(self):
+        return [json.loads(line) for line in self.path.read_text().splitlines()]
+
+    def test_spans_only_inside_operation(self):
+        """Test that spans outside an operation record nothing."""
+        codec.decode_meta(codec.encode_meta("a.com", "me"))
+        self.assertFalse(self.path.exists())
+
+        lines = []
+        with metrics.operation("lookup", lines.append):
+            codec.decode_meta(codec.encode_meta("a.com", "me"))
+            with metrics.operation("nested"):
+                codec.decode_meta(codec.encode_meta("b.com", "me"))
+
+        [record] = self.records()
+        self.assertEqual(record["op"], "lookup")
+        self.assertEqual(record["phases"]["decode"]["calls"], 2)
+        self.assertIn("other", record["phases"])
+        self.assertTrue(lines[0].startswith("[i] lookup:"))
+
+    def test_records_hold_no_entry_data(self):
+        """Test that records only name operations and phases."""
+        with patch('app.storage.DB_FILE', Path(self.test_dir) / "vault.db"):
+            db = StorageManager()
+        with metrics.operation("save"):
+            blob = SecurityManager.encrypt(codec.encode_meta("secret-site.com", "me"), b"k" * 32)
+            db.add_secret(blob)
+            db.get_blob(1)
+        db.close()
+
+        text = self.path.read_text()
+        self.assertNotIn("secret-site", text)
+        self.assertEqual(set(self.records()[0]["phases"]), {"aes", "sqlite", "other"})
+
+    def test_profiled_writes_dump(self):
+        """Test that profiling writes a pstats file."""
+        out = Path(self.test_dir) / "run.prof"
+        with patch('sys.stderr'):
+            with metrics.profiled(str(out)):
+                sum(range(1000))
+        self.assertGreater(out.stat().st_size, 0)
+
+
+class TestClipboard(unittest.TestCase):
+    """
+    Tests the clipboard manager against an in-memory backend.
+    """
+
+    def setUp(self):
+        self.board = [""]
+        self.copies = []
+        backend = (self.copy, lambda: self.board[0])
+        self.manager = ClipboardManager(timeout=60, backend=backend)
+        self.threads = threading.active_count()
+
+    def copy(self, value):
+        self.copies.append(value)
+        self.board[0] = value
+
+    def test_new_copy_replaces_pending_clear(self):
+        """Test that one timer serves every copy and only the latest clear runs."""
+        self.manager.copy("first")
+        self.manager.copy("second", timeout=0.05)
+        self.assertEqual(threading.active_count(), self.threads + 1)
+        self.manager.wait()
+        self.assertEqual(self.board[0], "")
+        self.assertEqual(self.copies, ["first", "second", ""])
+
+    def test_clear_keeps_foreign_content(self):
+        """Test that a clear leaves the clipboard alone if the user copied something else."""
+        self.manager.copy("secret")
+        self.board[0] = "something else"
+        self.manager.clear()
+        self.assertEqual(self.board[0], "something else")
+        self.assertFalse(self.manager.pending())
+
+    def test_agent_clears_on_lock(self):
+        """Test that the agent schedules clears by salted digest and runs them on lock."""
+        key_agent = KeyAgent("unused.sock")
+        key_agent.clipboard = self.manager
+        self.copy("secret")
+        value_digest = digest("secret")
+        self.assertNotEqual(value_digest, digest("secret"))    # salted per copy
+        reply = key_agent.handle({"op": "clip", "salt": value_digest[:16].hex(),
+                                  "digest": value_digest[16:].hex(), "after": 60})
+        self.assertTrue(reply["ok"])
+        self.assertTrue(self.manager.pending())
+        key_agent.handle({"op": "lock"})
+        self.assertEqual(self.board[0], "")
+
+
+class TestScriptView(unittest.TestCase):
+    """
+    Tests that scripting-mode prompts stay off stdout.
+    """
+
+    def test_credential_prompts_use_stderr(self):
+        """Test the passwd/retune prompts: stdout carries only the result."""
+        view = ScriptView()
+        stdout = io.StringIO()
+        with patch('app.views.getpass.getpass', side_effect=["old", "sk", "short", "long-enough", "long-enough"]), \
+                patch('builtins.input', return_value="n"), contextlib.redirect_stdout(stdout):
+            self.assertEqual(view.get_current_credentials("CHANGE MASTER PASSWORD"), ("old", "sk"))
+            self.assertEqual(view.get_new_master_password(), "long-enough")
+            self.assertFalse(view.confirm_rotate_secret_key())
+        self.assertEqual(stdout.getvalue(), "")
+
+
+class TestBreachCorpus(unittest.TestCase):
+    """
+    Tests building and querying the offline breach corpus.
+    """
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_build_and_lookup(self):
+        """Test unsorted input across several sort runs, duplicates and malformed lines."""
+        passwords = [f"password{i}".encode() for i in range(500)]
+        lines = [f"{breach.sha1(p).hex().upper()}:{i + 1}" for i, p in enumerate(passwords)]
+        lines.reverse()
+        lines += [f"{breach.sha1(passwords[0]).hex()}:10", "not-a-hash:3", ""]
+        source = self.test_dir / "pwned.txt"
+        source.write_text("\n".join(lines))
+
+        out = self.test_dir / "breach.bin"
+        self.assertEqual(breach.build(source, out, chunk_records=64), 500)
+        with breach.BreachCorpus(out) as corpus:
+            self.assertEqual(corpus.records, 500)
+            self.assertEqual(corpus.count(breach.sha1(passwords[0])), 11)
+            self.assertEqual(corpus.count(breach.sha1(passwords[499])), 500)
+            self.assertEqual(corpus.count(breach.sha1(b"correct horse battery staple")), 0)
+
+    def test_rejects_other_files(self):
+        """Test that a missing or foreign file is reported, not mapped."""
+        with self.assertRaises(breach.CorpusError):
+            breach.BreachCorpus(self.test_dir / "missing.bin")
+        (self.test_dir / "other.bin").write_bytes(b"x" * 100)
+        with self.assertRaises(breach.CorpusError):
+            breach.BreachCorpus(self.test_dir / "other.bin")
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Tests time-to-first-prompt of the interactive app, from a copy of the tree
+    (and of the built binary if VAULT_BINARY points to one).
+    """
+    SOURCE_BUDGET = 0.6     # seconds
+    BINARY_BUDGET = 2.0     # one-file builds unpack before starting
+    RUNS = 3
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        (self.test_dir / "data").mkdir()
+        with sqlite3.connect(self.test_dir / "data" / "vault.db") as conn:    # an initialized vault
+            conn.execute("CREATE TABLE config (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("INSERT INTO config VALUES ('salt', 'c2FsdA==')")
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def time_to_prompt(self, argv):
+        """Best of RUNS: seconds until 'Master Password' shows on the terminal."""
+        import pty
+        import signal
+
+        env = dict(os.environ, TERM="dumb", VAULT_AGENT_SOCK=str(self.test_dir / "no-agent.sock"))
+        best = None
+        for _ in range(self.RUNS):
+            start = time.perf_counter()
+            pid, fd = pty.fork()
+            if pid == 0:
+                os.chdir(self.test_dir)
+                os.execve(argv[0], argv, env)
+            output = b""
+            try:
+                while b"Master Password" not in output and time.perf_counter() - start < 10:
+                    output += os.read(fd, 1024)
+            except OSError:
+                pass
+            elapsed = time.perf_counter() - start
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            os.close(fd)
+            self.assertIn(b"Master Password", output)
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def test_prompt_needs_initialized_vault(self):
+        """Test that an empty vault.db (e.g. left by a scripting command) gets the setup flow, not the early prompt."""
+        empty = self.test_dir / "empty.db"
+        StorageManager(empty).close()
+        with patch('app.startup.DB_FILE', empty):
+            self.assertFalse(startup.is_initialized())
+        with patch('app.startup.DB_FILE', self.test_dir / "missing.db"):
+            self.assertFalse(startup.is_initialized())
+        with patch('app.startup.DB_FILE', self.test_dir / "data" / "vault.db"):
+            self.assertTrue(startup.is_initialized())
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs a pty")
+    def test_source_startup(self):
+        """Test that the unlock prompt shows within budget when run from source."""
+        root = Path(__file__).resolve().parent
+        shutil.copytree(root / "app", self.test_dir / "app")
+        shutil.copy2(root / "main.py", self.test_dir)
+        elapsed = self.time_to_prompt([sys.executable, str(self.test_dir / "main.py")])
+        self.assertLess(elapsed, self.SOURCE_BUDGET)
+
+    @unittest.skipUnless(os.environ.get("VAULT_BINARY") and hasattr(os, "fork"), "set VAULT_BINARY to a build")
+    def test_binary_startup(self):
+        """Test that the unlock prompt shows within budget from the built binary."""
+        build = Path(os.environ["VAULT_BINARY"])
+        binary = self.test_dir / build.name
+        if (build.parent / "_internal").is_dir():    # --onedir build
+            shutil.copytree(build.parent / "_internal", self.test_dir / "_internal")
+        shutil.copy2(build, binary)
+        elapsed = self.time_to_prompt([str(binary)])
+        self.assertLess(elapsed, self.BINARY_BUDGET)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file